@@ -2,16 +2,18 @@ import streamlit as st
 import pandas as pd
 from Bio import Entrez
 import numpy as np
-import plotly.express as px
 import os
 import re
-import io, zipfile, datetime
-from collections import defaultdict
+import datetime
 from streamlit_autorefresh import st_autorefresh
-import re
-import streamlit.components.v1 as components
-from utils.pipeline import (get_disease_name, generate_expression_atlas_link, fetch_gene_names, find_possible_target_of_drugs, analyze_pathways, get_overlapping_genes, get_drug_targets_dgidb_graphql, drug_with_links, normalize_disease_name, add_links_to_final_table, save_pathway_csvs, save_drug_csvs)
-from utils.utils import estimate_table_height
+from utils.tables import render_table
+from utils.charts import fold_change_chart
+from utils.pipeline import (generate_expression_atlas_link, get_overlapping_genes, filter_drug_interactions, drug_with_links, add_links_to_final_table, build_full_results_table, GENE_KEY)
+from utils.stages import (ANALYSIS_STAGES, EXPORT_ARTIFACT, file_digest, load_disease_name, submit_analysis, submit_export, export_key, load_job_artifact)
+from utils.export import zip_bytes
+from utils.jobs import get_job, load_artifact, artifact_path
+from utils.instrumentation import start_metrics_server
+from utils.warmup import start_warm_up
 from pathlib import Path
 import subprocess
 import webbrowser
@@ -22,6 +24,11 @@ st.set_page_config(
     page_icon="🧬"
 )
 
+# Prometheus endpoint, only when TRACTOME_METRICS_PORT is set
+start_metrics_server()
+# Analysis dependencies, Reactome library and indexes, loaded in the background while the form shows
+start_warm_up()
+
 st.markdown("""
     <style>
     .fixed-logo {
@@ -157,16 +164,42 @@ email = st.text_input("User e-mail:", key="user_email", label_visibility="collap
 Entrez.email = email
 
 #Step 2: Name from MeshID
-mesh_id = st.text_input("🔍 Enter MeSH ID (e.g., D003920 for Diabetes Mellitus):")
+# The MeSH ID and job are kept in the URL, so a refresh or a second tab reattaches to the running analysis
+if "mesh_id" not in st.session_state:
+    st.session_state["mesh_id"] = st.query_params.get("mesh", "")
+mesh_id = st.text_input("🔍 Enter MeSH ID (e.g., D003920 for Diabetes Mellitus):", key="mesh_id")
 
 spinner = st.spinner
+uploaded_file = None
+job_id = None
+
+# Milliseconds between progress checks of a running job
+JOB_POLL_INTERVAL = 2000
+
+STAGE_MESSAGES = {
+    "genes": "Mapping Ensembl IDs to gene names...",
+    "open_targets": "Checking Open Targets...",
+    "pathways": "Performing pathway analysis...",
+    "drugs": "Searching drug-gene interactions...",
+}
+
+
+def wait_for_stage(name):
+    """
+    Returns the result of an analysis stage, or stops the script until the next poll if it has not finished.
+    """
+    if name not in job["completed"]:
+        st.info(STAGE_MESSAGES[name])
+        st.stop()
+    return load_job_artifact(job_id, name)
+
 
 if mesh_id:
     with st.spinner("Fetching disease information..."):
-        disease, disease_url = get_disease_name(mesh_id)
+        # Already normalized to the Expression Atlas form
+        normalized_disease, disease_url = load_disease_name(mesh_id) or (None, None)
         
-        if disease:
-            normalized_disease = normalize_disease_name(disease)
+        if normalized_disease:
             st.success(f"🎯 Disease **[{normalized_disease}]({disease_url})** identified")
             
             # Step 3: File upload only after disease name is given
@@ -180,14 +213,46 @@ if mesh_id:
             
             
     if uploaded_file:
-        df_raw = pd.read_csv(uploaded_file, sep="\t")
+        tsv_bytes = uploaded_file.getvalue()
+        job_id = submit_analysis(file_digest(tsv_bytes), tsv_bytes)
+        st.query_params["mesh"] = mesh_id
+        st.query_params["job"] = job_id
         st.write("Uploaded correctly")
-        
-        with st.spinner("Mapping Ensembl IDs to gene names..."):
-            df_selected = fetch_gene_names(df_raw)
+    elif st.query_params.get("mesh") == mesh_id:
+        job_id = st.query_params.get("job")
+
+    if job_id:
+        # Charts are only drawn for a job, so the first page does not import plotly.express
+        import plotly.express as px
+
+        job = get_job(job_id)
+        if job is None:
+            st.warning("This analysis is no longer available, please upload the file again.")
+            st.stop()
+        if job["status"] == "failed":
+            st.warning(job["error"])
+            # Failed analyses are only started again on request, not on every rerun
+            if uploaded_file and st.button("Retry analysis"):
+                st.query_params["job"] = submit_analysis(file_digest(tsv_bytes), tsv_bytes, retry=True)
+                st.rerun()
+            st.stop()
+        if job["status"] != "done":
+            st.progress(job["progress"], text=f"Analysis running ({len(job['completed'])}/{len(ANALYSIS_STAGES)} steps done)")
+            st_autorefresh(interval=JOB_POLL_INTERVAL, key=f"poll_{job_id}")
+
+        # Timings of the stages finished so far (not cached, it grows while the job runs)
+        metrics = load_artifact(job_id, "metrics")
+        if metrics is not None:
+            with st.expander("Performance"):
+                st.dataframe(metrics, hide_index=True, width="stretch")
+
+        df_selected = wait_for_stage("genes")
+        if df_selected.attrs.get("failed"):
+            st.warning(f"Ensembl could not be reached for {len(df_selected.attrs['failed'])} genes, they are missing from the analysis.")
+
         
         # Step 4: Obtain Ensembl ID with links for the genes
-        df_selected_with_links = df_selected.copy()
+        df_selected_with_links = df_selected.drop(columns=[GENE_KEY], errors="ignore")
         df_selected_with_links["Gene"] = df_selected_with_links["Gene"].apply(
             lambda gene_id: f'<a href="https://www.ensembl.org/Multi/Search/Results?q={gene_id}" target="_blank">{gene_id}</a>'
         )
@@ -206,112 +271,8 @@ if mesh_id:
             st.warning("The gene table is empty. Stopping the program.")
             st.stop()
 
-        # Conversion of dataframe to HTML
-        html_table = df_selected_with_links_newNames.to_html(escape=False, index=False, table_id="geneTable")
-
-        # HTML code with CSS fixed in black and white
-        html_code = f"""
-        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-        <style>
-        /* Apply style to whole table */
-        .dataTables_wrapper, .dataTables_wrapper * {{
-            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-            color: #31333f !important;
-            font-size: 15px !important;
-        }}
-
-        /* Table */
-        #geneTable, #geneTable thead, #geneTable tbody, #geneTable tr, #geneTable td, #geneTable th {{
-            background-color: white !important;
-            color: #31333f !important;
-            border-color: #ccc !important;
-        }}
-
-        /* Headers */
-        #geneTable thead th {{
-            font-weight: 600 !important;
-        }}
-
-        /* Search inputs */
-        #geneTable input {{
-            background-color: white !important;
-            color: #31333f !important;
-            font-size: 14px !important;
-            border: 1px solid #ccc !important;
-        }}
-
-        /* Entry selections */
-        .dataTables_length select {{
-            background-color: white !important;
-            color: #31333f !important;
-            border: 1px solid #ccc !important;
-            font-size: 14px !important;
-        }}
-
-        /* Results info */
-        .dataTables_info {{
-            color: #31333f !important;
-        }}
-
-        /* Pages */
-        .dataTables_paginate a {{
-            color: #31333f !important;
-            font-size: 14px !important;
-            font-weight: normal !important;
-            padding: 6px 12px;
-            border-radius: 6px;
-            text-decoration: none;
-            margin: 0 2px;
-        }}
-
-        .dataTables_paginate a.current {{
-            background-color: #f0f0f0 !important;
-            font-weight: bold !important;
-            border: 1px solid #aaa !important;
-        }}
-
-        .dataTables_paginate a:hover {{
-            background-color: #e3e3e3 !important;
-        }}
-        </style>
-
-        <script>
-        $(document).ready(function() {{
-            var table = $('#geneTable').DataTable({{
-                scrollCollapse: true,
-                paging: true,
-                orderCellsTop: true,
-                fixedHeader: true
-            }});
-
-            // Add search inputs to each column
-            $('#geneTable thead tr').clone(true).appendTo('#geneTable thead');
-            $('#geneTable thead tr:eq(1) th').each(function(i) {{
-                var title = $(this).text();
-                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-
-                $('input', this).on('keyup change', function () {{
-                    if (table.column(i).search() !== this.value) {{
-                        table.column(i).search(this.value).draw();
-                    }}
-                }});
-            }});
-        }});
-        </script>
-
-        <div style="overflow-x:auto; margin-bottom: 0px;"">
-        {html_table}
-        </div>
-        """
-
-        height = estimate_table_height(df_selected)
-        
-        
-        # Show table
-        components.html(html_code, height=height, scrolling=True)
+        # Paginated table, filtered and sorted on the server
+        render_table(df_selected_with_links_newNames, key="geneTable")
         
         # Download button
         st.download_button(
@@ -320,35 +281,20 @@ if mesh_id:
             "genes.csv",
             "text/csv")
         
-        df_selected["Gene Name_raw"] = df_selected["Gene Name"]
-
-        gname_fc = df_selected.groupby("Gene Name_raw", as_index=False)["log_2 fold change"].sum()
-        gname_fc = gname_fc.sort_values("log_2 fold change", ascending=False)
-
-        # Graph for genes and their log2 fold change
-        fig = px.bar(
-            gname_fc,
-            x="Gene Name_raw",
-            y="log_2 fold change",
-            color="log_2 fold change",
-            color_continuous_scale="sunset",
-            title="Sum of log₂ fold change per gene",
-            labels={"Gene Name_raw": "Gene Name", "log_2 fold change": "Sum of log₂ fold change"},
-            height=500,
-            width=2000
-        )
-
-        st.plotly_chart(fig, width="stretch")
+        # Graph for genes and their log2 fold change: top and bottom genes, then all genes by rank
+        st.plotly_chart(fold_change_chart(df_selected), width="stretch")
 
         
         # Step 5: Search biotype and tractability for the genes in Open Targets
-        with st.spinner("Checking Open Targets..."):
-            openTargets_results = df_selected["Gene"].apply(find_possible_target_of_drugs)
-            openTargets_df = pd.DataFrame([r for r in openTargets_results if r is not None])
+        openTargets_results = wait_for_stage("open_targets")
+        # openTargets_df is formatted for display below, the summary table uses the raw results
+        openTargets_df = openTargets_results
+        if openTargets_df.attrs.get("failed"):
+            st.warning(f"Open Targets could not be reached for {len(openTargets_df.attrs['failed'])} genes, their results are missing.")
 
         if not openTargets_df.empty:
             if "Name" in openTargets_df.columns:
-                openTargets_df = openTargets_df.drop(columns=["Name"])
+                openTargets_df = openTargets_df.drop(columns=["Name", "Genetic Constraint"], errors="ignore")
 
                 openTargets_df = openTargets_df.sort_values(by="Gene Symbol")
 
@@ -382,107 +328,7 @@ if mesh_id:
                     """
                 )
                 
-                html_ot_table = openTargets_df_newNames.to_html(escape=False, index=False, table_id="openTargetsTable")
-
-                html_ot_scroll = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                    /* Apply style to whole table */
-                    .dataTables_wrapper, .dataTables_wrapper * {{
-                        font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                        color: #31333f !important;
-                        font-size: 15px !important;
-                    }}
-
-                    /* Table */
-                    #openTargetsTable, #openTargetsTable thead, #openTargetsTable tbody, #openTargetsTable tr, #openTargetsTable td, #openTargetsTable th {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        border-color: #ccc !important;
-                    }}
-
-                    /* Headers */
-                    #openTargetsTable thead th {{
-                        font-weight: 600 !important;
-                    }}
-
-                    /* Search inputs */
-                    #openTargetsTable input {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        font-size: 14px !important;
-                        border: 1px solid #ccc !important;
-                    }}
-
-                    /* Entry selections */
-                    .dataTables_length select {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        border: 1px solid #ccc !important;
-                        font-size: 14px !important;
-                    }}
-
-                    /* Results info */
-                    .dataTables_info {{
-                        color: #31333f !important;
-                    }}
-
-                    /* Pages */
-                    .dataTables_paginate a {{
-                        color: #31333f !important;
-                        font-size: 14px !important;
-                        font-weight: normal !important;
-                        padding: 6px 12px;
-                        border-radius: 6px;
-                        text-decoration: none;
-                        margin: 0 2px;
-                    }}
-
-                    .dataTables_paginate a.current {{
-                        background-color: #f0f0f0 !important;
-                        font-weight: bold !important;
-                        border: 1px solid #aaa !important;
-                    }}
-
-                    .dataTables_paginate a:hover {{
-                        background-color: #e3e3e3 !important;
-                    }}
-                    </style>
-
-                    <script>
-                    $(document).ready(function() {{
-                        var table = $('#openTargetsTable').DataTable({{
-                            scrollCollapse: true,
-                            paging: true,
-                            orderCellsTop: true,
-                            fixedHeader: true
-                        }});
-
-                        // Add search inputs to each column
-                        $('#openTargetsTable thead tr').clone(true).appendTo('#openTargetsTable thead');
-                        $('#openTargetsTable thead tr:eq(1) th').each(function(i) {{
-                            var title = $(this).text();
-                            $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-
-                            $('input', this).on('keyup change', function () {{
-                                if (table.column(i).search() !== this.value) {{
-                                    table.column(i).search(this.value).draw();
-                                }}
-                            }});
-                        }});
-                    }});
-                    </script>
-                    
-                    <div style="overflow-x:auto">
-                        {html_ot_table}
-                    </div>
-                """
-                
-                height = estimate_table_height(openTargets_df)
-                components.html(html_ot_scroll, height=height+200, scrolling=True)
+                render_table(openTargets_df_newNames, key="openTargetsTable")
                 
                 st.download_button(
                     "📥 Download results from Open Targets",
@@ -536,6 +382,7 @@ if mesh_id:
                 st.warning("No results found in Open Targets.")
 
         
+        all_pathways = wait_for_stage("pathways")
         with st.spinner("Performing pathway analysis..."):
             
             # Step 6: Search pathways for the genes
@@ -554,114 +401,20 @@ if mesh_id:
                 """
             )
 
+            # The drug interactions are needed by the summary table whatever the number of pathways
+            all_drug_df = wait_for_stage("drugs")
+            top_pathways = None
+
             number_pathways = st.text_input("🔍 Enter number of pathways to retrieve", value="10")
             if number_pathways:
                 try:
                     number_pathways = int(number_pathways)
-                    top_pathways = analyze_pathways(df_selected, number_pathways)
-                    top_pathways["-log10(Adj P)"] = -np.log10(top_pathways["Adjusted P-value"])
-                    top_pathways = top_pathways.sort_values("Adjusted P-value", ascending=True)
+                    top_pathways = all_pathways.head(number_pathways).copy() if not all_pathways.empty else None
 
 
                     if top_pathways is not None:
-                        html_pathway_table = top_pathways[["Reactome Link", "Adjusted P-value", "-log10(Adj P)", "Overlap", "Input %", "Sum log2fc"]].to_html(escape=False, index=False, table_id="topPathwayTable")
-                        
-                        html_code_top_pathways = f"""
-                        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                        <style>
-                            body, .dataTables_wrapper, .dataTables_wrapper * {{
-                                font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                                color: #31333f !important;
-                                font-size: 15px !important;
-                            }}
-
-                            #topPathwayTable {{
-                                width: 100% !important;
-                            }}
-
-                            #topPathwayTable, #topPathwayTable thead, #topPathwayTable tbody, #topPathwayTable tr, #topPathwayTable td, #topPathwayTable th {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border-color: #ccc !important;
-                            }}
-
-                            #topPathwayTable thead th {{
-                                font-weight: 600 !important;
-                            }}
-
-                            #topPathwayTable input {{
-                                width: 100%;
-                                box-sizing: border-box;
-                                background-color: white !important;
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                border: 1px solid #ccc !important;
-                            }}
-
-                            .dataTables_length select {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border: 1px solid #ccc !important;
-                                font-size: 14px !important;
-                            }}
-
-                            .dataTables_info {{
-                                color: #31333f !important;
-                            }}
-
-                            .dataTables_paginate a {{
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                font-weight: normal !important;
-                                padding: 6px 12px;
-                                border-radius: 6px;
-                                text-decoration: none;
-                                margin: 0 2px;
-                            }}
-
-                            .dataTables_paginate a.current {{
-                                background-color: #f0f0f0 !important;
-                                font-weight: bold !important;
-                                border: 1px solid #aaa !important;
-                            }}
-
-                            .dataTables_paginate a:hover {{
-                                background-color: #e3e3e3 !important;
-                            }}
-                        </style>
-
-                        <script>
-                            $(document).ready(function() {{
-                                var table = $('#topPathwayTable').DataTable({{
-                                    scrollCollapse: true,
-                                    paging: true,
-                                    orderCellsTop: true,
-                                    fixedHeader: false,
-                                    autoWidth: false
-                                }});
-
-                                $('#topPathwayTable thead tr').clone(true).appendTo('#topPathwayTable thead');
-                                $('#topPathwayTable thead tr:eq(1) th').each(function(i) {{
-                                    var title = $(this).text();
-                                    $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                                }});
-
-                                $('#topPathwayTable thead').on('keyup change', 'input', function () {{
-                                    let i = $(this).parent().index();
-                                    table.column(i).search(this.value).draw();
-                                }});
-                            }});
-                        </script>
-
-                        <div style="overflow-x:auto">
-                            {html_pathway_table}
-                        </div>
-                        """
-                        height = estimate_table_height(top_pathways)
-                        components.html(html_code_top_pathways, height=height, scrolling=True)
+                        top_pathways["-log10(Adj P)"] = -np.log10(top_pathways["Adjusted P-value"])
+                        render_table(top_pathways[["Reactome Link", "Adjusted P-value", "-log10(Adj P)", "Overlap", "Input %", "Sum log2fc"]], key="topPathwayTable")
                         
                         st.download_button(
                             "📥 Download Top N pathways CSV",
@@ -690,115 +443,13 @@ if mesh_id:
                             lambda gene_id: f'<a href="https://www.ensembl.org/Multi/Search/Results?q={gene_id}" target="_blank">{gene_id}</a>'
                         )
                         
-                        pathway_genes = pathway_genes.drop(columns=["Gene Name_raw", "abs_fc"])
-                        
                         pathway_genes_newNames = pathway_genes.rename(columns={
                             "Gene":"Ensembl ID",
                             "Gene Name":"Gene"
                         })
 
-                        # Render HTML table with scroll
-                        html_genespathway_table = pathway_genes_newNames.to_html(escape=False, index=False, table_id="pathwayGeneTable")
-
-
-                        # HTML and DataTables JS
-                        html_code_pathway = f"""
-                        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                        <style>
-                            .dataTables_wrapper, .dataTables_wrapper * {{
-                                font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                                color: #31333f !important;
-                                font-size: 15px !important;
-                            }}
-
-                            #pathwayGeneTable {{
-                                width: 100% !important;
-                            }}
-
-                            #pathwayGeneTable, #pathwayGeneTable thead, #pathwayGeneTable tbody, #pathwayGeneTable tr, #pathwayGeneTable td, #pathwayGeneTable th {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border-color: #ccc !important;
-                            }}
-
-                            #pathwayGeneTable thead th {{
-                                font-weight: 600 !important;
-                            }}
-
-                            #pathwayGeneTable input {{
-                                width: 100%;
-                                box-sizing: border-box;
-                                background-color: white !important;
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                border: 1px solid #ccc !important;
-                            }}
-
-                            .dataTables_length select {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border: 1px solid #ccc !important;
-                                font-size: 14px !important;
-                            }}
-
-                            .dataTables_info {{
-                                color: #31333f !important;
-                            }}
-
-                            .dataTables_paginate a {{
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                font-weight: normal !important;
-                                padding: 6px 12px;
-                                border-radius: 6px;
-                                text-decoration: none;
-                                margin: 0 2px;
-                            }}
-
-                            .dataTables_paginate a.current {{
-                                background-color: #f0f0f0 !important;
-                                font-weight: bold !important;
-                                border: 1px solid #aaa !important;
-                            }}
-
-                            .dataTables_paginate a:hover {{
-                                background-color: #e3e3e3 !important;
-                            }}
-                        </style>
-
-                        <script>
-                            $(document).ready(function() {{
-                                var table = $('#pathwayGeneTable').DataTable({{
-                                    scrollCollapse: true,
-                                    paging: true,
-                                    orderCellsTop: true,
-                                    fixedHeader: false,
-                                    autoWidth: false
-                                }});
-
-                                $('#pathwayGeneTable thead tr').clone(true).appendTo('#pathwayGeneTable thead');
-                                $('#pathwayGeneTable thead tr:eq(1) th').each(function(i) {{
-                                    var title = $(this).text();
-                                    $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                                }});
-
-                                $('#pathwayGeneTable thead').on('keyup change', 'input', function () {{
-                                    let i = $(this).parent().index();
-                                    table.column(i).search(this.value).draw();
-                                }});
-                            }});
-                        </script>
-
-                        <div style="overflow-x:auto">
-                            {html_genespathway_table}
-                        </div>
-                        """
-
-                        height = estimate_table_height(pathway_genes)
-                        components.html(html_code_pathway, height=height, scrolling=True)
+                        # Paginated table with links
+                        render_table(pathway_genes_newNames, key="pathwayGeneTable")
 
                         st.download_button(
                             "📥 Download Important Genes CSV",
@@ -810,405 +461,119 @@ if mesh_id:
                 except ValueError:
                     st.error("Please enter a valid integer.")
                 
-                st.markdown("# Drug-Gene Interactions")
-                with st.spinner("Searching drug-gene interactions..."):
+                if top_pathways is not None:
+                    st.markdown("# Drug-Gene Interactions")
+                    if all_drug_df.attrs.get("failed"):
+                        st.warning(f"DGIdb could not be reached for {len(all_drug_df.attrs['failed'])} genes, their interactions are missing.")
+                    with st.spinner("Searching drug-gene interactions..."):
                 
-                    selected_pathway = st.selectbox(
-                        "🔍 Select a pathway to see drugs",
-                    top_pathways["Term"].tolist(),
-                    key="drugs"
-                    )
-                    selected_pathway_row = top_pathways[top_pathways["Term"] == selected_pathway].iloc[0]
+                        selected_pathway = st.selectbox(
+                            "🔍 Select a pathway to see drugs",
+                        top_pathways["Term"].tolist(),
+                        key="drugs"
+                        )
+                        selected_pathway_row = top_pathways[top_pathways["Term"] == selected_pathway].iloc[0]
 
-                    pathway_genes = get_overlapping_genes(df_selected, selected_pathway_row)
-                    drug_df = get_drug_targets_dgidb_graphql(pathway_genes["Gene Name"].tolist())
+                        pathway_genes = get_overlapping_genes(df_selected, selected_pathway_row)
+                        drug_df = filter_drug_interactions(all_drug_df, pathway_genes["Gene Name"].tolist())
 
-                if not drug_df.empty:
+                    if not drug_df.empty:
                     
-                    drug_df_with_links = drug_with_links(drug_df)
+                        drug_df_with_links = drug_with_links(drug_df)
         
-                    drug_df_with_links = drug_df_with_links.replace(r'^\s*$', np.nan, regex=True)
+                        drug_df_with_links = drug_df_with_links.replace(r'^\s*$', np.nan, regex=True)
                     
-                    # HTML table
-                    html_drug_table = drug_df_with_links.to_html(escape=False, index=False, table_id="drugTable")
-
-                    html_code_drug = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                        .dataTables_wrapper, .dataTables_wrapper * {{
-                            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                            color: #31333f !important;
-                            font-size: 15px !important;
-                        }}
-
-                        #drugTable {{
-                            width: 100% !important;
-                        }}
-
-                        #drugTable, #drugTable thead, #drugTable tbody, #drugTable tr, #drugTable td, #drugTable th {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border-color: #ccc !important;
-                        }}
-
-                        #drugTable thead th {{
-                            font-weight: 600 !important;
-                        }}
-
-                        #drugTable input {{
-                            width: 100%;
-                            box-sizing: border-box;
-                            background-color: white !important;
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            border: 1px solid #ccc !important;
-                        }}
-
-                        .dataTables_length select {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border: 1px solid #ccc !important;
-                            font-size: 14px !important;
-                        }}
-
-                        .dataTables_info {{
-                            color: #31333f !important;
-                        }}
-
-                        .dataTables_paginate a {{
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            font-weight: normal !important;
-                            padding: 6px 12px;
-                            border-radius: 6px;
-                            text-decoration: none;
-                            margin: 0 2px;
-                        }}
-
-                        .dataTables_paginate a.current {{
-                            background-color: #f0f0f0 !important;
-                            font-weight: bold !important;
-                            border: 1px solid #aaa !important;
-                        }}
-
-                        .dataTables_paginate a:hover {{
-                            background-color: #e3e3e3 !important;
-                        }}
-                    </style>
-
-                    <script>
-                        $(document).ready(function() {{
-                            var table = $('#drugTable').DataTable({{
-                                scrollCollapse: true,
-                                paging: true,
-                                orderCellsTop: true,
-                                fixedHeader: false,
-                                autoWidth: false
-                            }});
-
-                            $('#drugTable thead tr').clone(true).appendTo('#drugTable thead');
-                            $('#drugTable thead tr:eq(1) th').each(function(i) {{
-                                var title = $(this).text();
-                                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                            }});
-
-                            $('#drugTable thead').on('keyup change', 'input', function () {{
-                                let i = $(this).parent().index();
-                                table.column(i).search(this.value).draw();
-                            }});
-                        }});
-                    </script>
-
-                    <div style="overflow-x:auto">
-                        {html_drug_table}
-                    </div>
-                    """
-                    height = estimate_table_height(drug_df)
-                    components.html(html_code_drug, height=height, scrolling=True)
+                        # Paginated table with links
+                        render_table(drug_df_with_links, key="drugTable")
                     
         
-                    st.download_button("📥 Download Drug Interactions CSV", drug_df.to_csv(index=False), "drug_interactions.csv", "text/csv")
-                    
-                    # Gene selection and plot
-                    unique_genes = drug_df_with_links['Gene'].apply(lambda x: re.search(r'>(.*?)<', x).group(1)).unique()
-                    selected_gene = st.selectbox("Select a gene to view its drug interaction scores", unique_genes)
-
-                    # Filter by selected gene
-                    gene_df = drug_df_with_links[drug_df['Gene'] == selected_gene]
-                    gene_df = gene_df.sort_values(by="Interaction Score", ascending=False)
-
-                    # Plot
-                    fig = px.bar(
-                        gene_df,
-                        x='Drug',
-                        y='Interaction Score',
-                        hover_data=['Interaction Type', 'Source', 'PMID'],
-                        title=f"Drug Interactions for {selected_gene}",
-                        labels={'Interaction Score': 'Interaction Score', 'Drug': 'Drug'},
-                    )
-                    fig.update_layout(xaxis_tickangle=-45)
-
-                    st.plotly_chart(fig)
+                        st.download_button("📥 Download Drug Interactions CSV", drug_df.to_csv(index=False), "drug_interactions.csv", "text/csv")
                     
-                    if 'Interaction Type' in drug_df.columns:
-                        st.markdown("# Distribution of Interaction Types")
-
-                        # Count each type
-                        interaction_counts = drug_df['Interaction Type'].value_counts().reset_index()
-                        interaction_counts.columns = ['Interaction Type', 'Count']
-
-                        # Pie chart
-                        pie_fig = px.pie(
-                            interaction_counts,
-                            values='Count',
-                            names='Interaction Type',
-                            title='Percentage of Interaction Types',
-                            hole=0.4
+                        # Gene selection and plot
+                        unique_genes = drug_df_with_links['Gene'].apply(lambda x: re.search(r'>(.*?)<', x).group(1)).unique()
+                        selected_gene = st.selectbox("Select a gene to view its drug interaction scores", unique_genes)
+
+                        # Filter by selected gene
+                        gene_df = drug_df_with_links[drug_df['Gene'] == selected_gene]
+                        gene_df = gene_df.sort_values(by="Interaction Score", ascending=False)
+
+                        # Plot
+                        fig = px.bar(
+                            gene_df,
+                            x='Drug',
+                            y='Interaction Score',
+                            hover_data=['Interaction Type', 'Source', 'PMID'],
+                            title=f"Drug Interactions for {selected_gene}",
+                            labels={'Interaction Score': 'Interaction Score', 'Drug': 'Drug'},
                         )
+                        fig.update_layout(xaxis_tickangle=-45)
 
-                        # Group by type of interaction
-                        interaction_grouped = (
-                            drug_df.groupby('Interaction Type', group_keys=False)
-                            .apply(lambda df: [f"{g} → {d}" for g, d in zip(df['Gene'], df['Drug'])], include_groups=False)
-                        )
+                        st.plotly_chart(fig)
+                    
+                        if 'Interaction Type' in drug_df.columns:
+                            st.markdown("# Distribution of Interaction Types")
+
+                            # Count each type
+                            interaction_counts = drug_df['Interaction Type'].value_counts().reset_index()
+                            interaction_counts.columns = ['Interaction Type', 'Count']
+
+                            # Pie chart
+                            pie_fig = px.pie(
+                                interaction_counts,
+                                values='Count',
+                                names='Interaction Type',
+                                title='Percentage of Interaction Types',
+                                hole=0.4
+                            )
+
+                            # Group by type of interaction
+                            interaction_grouped = (
+                                drug_df.groupby('Interaction Type', group_keys=False)
+                                .apply(lambda df: [f"{g} → {d}" for g, d in zip(df['Gene'], df['Drug'])], include_groups=False)
+                            )
 
                         
 
-                        # Convert to DataFrame with columns according to interaction type
-                        max_len = interaction_grouped.map(len).max()
-                        interaction_wide = pd.DataFrame({
-                            interaction_type: values + [""] * (max_len - len(values))  
-                            for interaction_type, values in interaction_grouped.items()
-                        })
+                            # Convert to DataFrame with columns according to interaction type
+                            max_len = interaction_grouped.map(len).max()
+                            interaction_wide = pd.DataFrame({
+                                interaction_type: values + [""] * (max_len - len(values))  
+                                for interaction_type, values in interaction_grouped.items()
+                            })
 
-                        # Layout: 2 columns
-                        col1, col2 = st.columns([1.5, 1.8])
+                            # Layout: 2 columns
+                            col1, col2 = st.columns([1.5, 1.8])
 
-                        with col1:
-                            st.plotly_chart(pie_fig)
+                            with col1:
+                                st.plotly_chart(pie_fig)
 
-                        with col2:
-                            st.markdown("**Gene–Drug Interactions by Interaction Type**")
-                            st.dataframe(interaction_wide, width="stretch")              
+                            with col2:
+                                st.markdown("**Gene–Drug Interactions by Interaction Type**")
+                                st.dataframe(interaction_wide, width="stretch")              
                         
-                    else:
-                        st.info("No 'Interaction Type' column found.")
+                        else:
+                            st.info("No 'Interaction Type' column found.")
 
-                else:
-                    st.warning("No drug-gene interactions found.")
+                    else:
+                        st.warning("No drug-gene interactions found.")
                     
             else:
                 st.warning("No enriched pathways found.")
         # -- Merge all data into a full report table --
         with st.spinner("Creating summary table..."):
 
-            # First, clean and prepare dataframes
-            merged = df_selected.copy()
-
-            # Merge with Open Targets
-            if not openTargets_df.empty:
-                ot_clean = openTargets_df.copy()
-                ot_clean["Tractability"] = ot_clean["Tractability"].str.replace(r'<.*?>', '', regex=True)
-                merged = pd.merge(merged, ot_clean.drop(columns=["Biotype_raw"]), how="left", left_on="Gene Name", right_on="Gene Symbol")
-
-                merged["abs_fc"] = merged["log_2 fold change"].abs()
-
-                # Drug–gene interactions for all genes
-                all_drug_df = get_drug_targets_dgidb_graphql(merged["Gene Name"].unique().tolist())
-
-            if not all_drug_df.empty:
-                drug_clean = all_drug_df.copy()
-                drug_summary = drug_clean.groupby("Gene").agg({
-                    "Drug": lambda x: "; ".join(sorted(set(x))),
-                    "Interaction Type": lambda x: "; ".join(sorted(set(x))),
-                    "PMID": lambda x: "; ".join(sorted(set(str(p) for p in x if p != 'N/A'))),
-                    "Interaction Score": "mean"
-                }).reset_index()
-
-                merged = pd.merge(merged, drug_summary, how="left", left_on="Gene Name", right_on="Gene")
-
-            if not top_pathways.empty:
-                gene_to_pathways = defaultdict(list)
-                for _, row in top_pathways.iterrows():
-                    pathway_name = row["Term"]
-                    genes_in_pathway = [g.strip().upper() for g in row["Genes"].split(";")]
-                    for gene in genes_in_pathway:
-                        gene_to_pathways[gene].append(pathway_name)
-
-                merged["Gene Name"] = merged["Gene Name"].astype(str).str.strip().str.upper()
-                merged["Pathways"] = merged["Gene Name"].apply(lambda g: "; ".join(gene_to_pathways.get(g, [])))
-
-                drug_summary = drug_clean.groupby("Gene").agg({
-                        "Drug": lambda x: "; ".join(sorted(set(x))),
-                        "Interaction Type": lambda x: "; ".join(sorted(set(x))),
-                        "PMID": lambda x: "; ".join(sorted(set(str(p) for p in x if p != 'N/A'))),
-                        "Interaction Score": "mean"
-                        }).reset_index()
-                merged = pd.merge(merged, drug_summary, how="left", left_on="Gene Name", right_on="Gene")
-                # Drop the right-side 'Gene' from drug_summary to not be redundant
-                merged = merged.drop(columns=["Gene_y"], errors="ignore")
-
-                # Rename Gene_x column
-                if "Gene_x" in merged.columns:
-                        merged = merged.rename(columns={"Gene_x": "Gene"})
-
-                # Remove suffixes from Drug/Interaction columns when duplicated
-                for col in merged.columns:
-                        if col.endswith("_x") and col[:-2] + "_y" in merged.columns:
-                            # Keep _x version, drop _y
-                            merged = merged.drop(columns=[col[:-2] + "_y"])
-                            merged = merged.rename(columns={col: col[:-2]})
-
-                            
-                if not top_pathways.empty:
-                    pathway_genes_unique = pathway_genes[["Gene Name"]].drop_duplicates()
-                    pathway_genes_unique["Pathway Match"] = True
-                    merged = pd.merge(
-                            merged,
-                            pathway_genes[["Gene Name", "abs_fc"]],
-                            how="left",
-                            on="Gene Name"
-                        )
+            # One row per gene, joined with Open Targets, drug interactions and pathways
+            merged = build_full_results_table(df_selected, openTargets_results, all_drug_df, top_pathways)
 
-                            
-                #Delete duplicated columns
-                merged = merged.drop(columns=["Gene_y", "Gene Symbol", "Tractability_raw", "Gene Name_raw_x", "Gene Name_raw_y", "abs_fc_y", "log_2 fold change_y"], errors="ignore")
-                merged = merged.rename(columns={"Gene_x": "Gene", "abs_fc_x" : "abs_fc"})
-                dupes = merged.columns[merged.columns.duplicated()].tolist()
-                merged = merged.loc[:, ~merged.columns.duplicated(keep="first")]
-
-                #Add pathways in which gene interacts
-                gene_to_pathways = defaultdict(list)
-
-                if not top_pathways.empty:
-                    for _, row in top_pathways.iterrows():
-                        pathway_name = row["Term"]
-                        genes_in_pathway = [g.strip().upper() for g in row["Genes"].split(";")]
-                        for gene in genes_in_pathway:
-                            gene_to_pathways[gene].append(pathway_name)
-
-                merged["Gene Name"] = merged["Gene Name"].astype(str).str.strip().str.upper()
-                merged["Pathways"] = merged["Gene Name"].apply(lambda g: "; ".join(gene_to_pathways.get(g, [])))
-                merged = merged.drop(columns=["Gene Name_raw", "abs_fc", "Ensembl ID"])
-                
-                merged["Gene"] = merged["Gene"].apply(
-                        lambda gene_id: f'<a href="https://www.ensembl.org/Multi/Search/Results?q={gene_id}" target="_blank">{gene_id}</a>'
-                    )
-                
-                merged_newNames = merged.rename(columns={
-                    "Gene":"Ensembl ID",
-                    "Gene Name":"Gene"
-                })
-                
-                # Apply to your merged table
-                merged_with_links = add_links_to_final_table(merged_newNames)
+            if top_pathways is not None and not top_pathways.empty:
+                merged_with_links = add_links_to_final_table(merged)
                 merged_with_links = merged_with_links.replace(r'^\s*$', np.nan, regex=True)
 
 
                 # Show and download button
                 st.markdown("## 📦 Download Full Results Table")
                 
-                html_final_table = merged_with_links.to_html(escape=False, index=False, table_id="finalTable")
-
-                html_code_final = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                        .dataTables_wrapper, .dataTables_wrapper * {{
-                            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                            color: #31333f !important;
-                            font-size: 12px !important;
-                        }}
-
-                        #finalTable {{
-                            width: 100% !important;
-                        }}
-
-                        #finalTable, #finalTable thead, #finalTable tbody, #finalTable tr, #finalTable td, #finalTable th {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border-color: #ccc !important;
-                        }}
-
-                        #finalTable thead th {{
-                            font-weight: 600 !important;
-                        }}
-
-                        #finalTable input {{
-                            width: 100%;
-                            box-sizing: border-box;
-                            background-color: white !important;
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            border: 1px solid #ccc !important;
-                        }}
-
-                        .dataTables_length select {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border: 1px solid #ccc !important;
-                            font-size: 14px !important;
-                        }}
-
-                        .dataTables_info {{
-                            color: #31333f !important;
-                        }}
-
-                        .dataTables_paginate a {{
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            font-weight: normal !important;
-                            padding: 6px 12px;
-                            border-radius: 6px;
-                            text-decoration: none;
-                            margin: 0 2px;
-                        }}
-
-                        .dataTables_paginate a.current {{
-                            background-color: #f0f0f0 !important;
-                            font-weight: bold !important;
-                            border: 1px solid #aaa !important;
-                        }}
-
-                        .dataTables_paginate a:hover {{
-                            background-color: #e3e3e3 !important;
-                        }}
-                    </style>
-
-                    <script>
-                        $(document).ready(function() {{
-                            var table = $('#finalTable').DataTable({{
-                                scrollCollapse: true,
-                                paging: true,
-                                orderCellsTop: true,
-                                fixedHeader: false,
-                                autoWidth: false
-                            }});
-
-                            $('#finalTable thead tr').clone(true).appendTo('#finalTable thead');
-                            $('#finalTable thead tr:eq(1) th').each(function(i) {{
-                                var title = $(this).text();
-                                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                            }});
-
-                            $('#finalTable thead').on('keyup change', 'input', function () {{
-                                let i = $(this).parent().index();
-                                table.column(i).search(this.value).draw();
-                            }});
-                        }});
-                    </script>
-
-                    <div style="overflow-x:auto">
-                        {html_final_table}
-                    </div>
-                    """
-                height = estimate_table_height(merged)
-                components.html(html_code_final, height=height, scrolling=True)
+                render_table(merged_with_links, key="finalTable", font_size=12)
 
                 st.download_button(
                         "📥 Download Full Combined CSV",
@@ -1263,15 +628,10 @@ if mesh_id:
                     if not selected:
                         st.warning("Select at least one table to enable the download.")
                     else:
-                        zip_buf = io.BytesIO()
-                        with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                            for fname, df in selected:
-                                zf.writestr(fname, df.to_csv(index=False))
-                        zip_buf.seek(0)
-
+                        # The archive is only built when the button is clicked
                         st.download_button(
                             label="📥 Download selected (.zip)",
-                            data=zip_buf.getvalue(),
+                            data=lambda: zip_bytes(selected),
                             file_name=f"selected_tables_{datetime.date.today().isoformat()}.zip",
                             mime="application/zip",
                             key="zip_download_btn"
@@ -1302,29 +662,22 @@ if mesh_id:
                     )
 
                     if st.button("Generate and Download Tables"):
-                        with st.spinner("Generating all CSVs..."):
-                            drug_csvs = save_drug_csvs(df_selected, top_pathways)
-                            pathway_csvs = save_pathway_csvs(df_selected, top_pathways)
-
-                            # Build ZIP in memory
-                            zip_buf = io.BytesIO()
-                            with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                                # Add pathway CSVs
-                                for fname, data in pathway_csvs.items():
-                                    zf.writestr(fname, data)
-                                # Add drug CSVs
-                                for fname, data in drug_csvs.items():
-                                    zf.writestr(fname, data)
-                                # Add any extra files
-                                for f in extra_files:
-                                    if os.path.exists(f):
-                                        zf.write(f, arcname=os.path.basename(f))
-
-                            zip_buf.seek(0)
-
+                        st.session_state["export_job"] = submit_export(job_id, number_pathways, df_selected, top_pathways, all_drug_df, extra_files, retry=True)
+
+                    # The ZIP archive is written by a background job; the page polls until it is done
+                    export_job = get_job(st.session_state["export_job"]) if "export_job" in st.session_state else None
+                    if export_job is not None and export_job["key"] != export_key(job_id, number_pathways):
+                        export_job = None
+                    if export_job is not None and export_job["status"] == "failed":
+                        st.warning(export_job["error"])
+                    elif export_job is not None and export_job["status"] != "done":
+                        st.info("Generating all CSVs...")
+                        st_autorefresh(interval=JOB_POLL_INTERVAL, key=f"poll_{export_job['job_id']}")
+                    elif export_job is not None:
+                        zip_path = artifact_path(export_job["job_id"], EXPORT_ARTIFACT)
                         st.download_button(
                             label="📥 Download All Tables",
-                            data=zip_buf.getvalue(),
+                            data=lambda: Path(zip_path).read_bytes(),
                             file_name="all_tables.zip",
                             mime="application/zip"
                         )
@@ -4,13 +4,12 @@ from Bio import Entrez
 import plotly.express as px
 import os
 import re
-import io, zipfile, datetime
-import re
-import streamlit.components.v1 as components
-from utils.pipeline import (normalize_disease_name, save_pathway_csvs, save_drug_csvs)
-from utils.utils import estimate_table_height
-import time
-from pathlib import Path
+import datetime
+from utils.tables import render_table
+from utils.charts import fold_change_chart
+from utils.pipeline import read_expression_tsv
+from utils.demo_bundle import DemoBundle
+from utils.export import zip_bytes
 
 # Set page title and icon
 st.set_page_config(
@@ -147,6 +146,15 @@ st.markdown("""
 email = st.text_input("User e-mail:", key="user_email", label_visibility="collapsed", value="")
 Entrez.email = email
 
+@st.cache_resource(show_spinner=False)
+def load_demo_bundle():
+    """
+    The precomputed demo results, loaded once per server process and shared by every session.
+    """
+    return DemoBundle()
+
+demo = load_demo_bundle()
+
 #Step 2: Name from MeshID default D003110
 mesh_id = st.text_input("🔍 Enter MeSH ID (e.g., D003920 for Diabetes Mellitus):", value="D003110")
 
@@ -155,11 +163,10 @@ uploaded_file = None
 
 if mesh_id:
     with st.spinner("Fetching disease information..."):
-        disease = "Colonic Neoplasms"
+        normalized_disease = "Colonic Neoplasms"
         disease_url = "https://www.ncbi.nlm.nih.gov/mesh/68003110"
         
-        if disease:
-            normalized_disease = normalize_disease_name(disease)
+        if normalized_disease:
             st.success(f"🎯 Disease **[{normalized_disease}]({disease_url})** identified")
             
             # Step 3: File upload only after disease name is given default link to Expression Atlas
@@ -171,126 +178,18 @@ if mesh_id:
 
             if uploaded_file is None:
                 #demo Expression Atlas file
-                uploaded_file = "../assets/demoData/colorectal.tsv"
+                uploaded_file = "colorectal.tsv"
        
     if uploaded_file:
-        df_raw = pd.read_csv(uploaded_file, sep="\t")
+        df_raw = demo.table("expression") if isinstance(uploaded_file, str) else read_expression_tsv(uploaded_file)
         st.write("Uploaded correctly")
         
-        with st.spinner("Mapping Ensembl IDs to gene names..."):
-            time.sleep(1)
-        
         # Step 4: Obtain Ensembl ID with links for the genes. Default csv file
         st.markdown("## Gene Table with Links to Ensembl")
 
-        # Conversion of dataframe to HTML
-        df_genes = pd.read_csv("../assets/demoData/genes.csv", sep=",")
-        html_table = df_genes.to_html(
-            escape=False, index=False, table_id="geneTable"
-        )
-
-        # HTML code with CSS fixed in black and white
-        html_code = f"""
-        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-        <style>
-        /* Apply style to whole table */
-        .dataTables_wrapper, .dataTables_wrapper * {{
-            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-            color: #31333f !important;
-            font-size: 15px !important;
-        }}
-
-        /* Table */
-        #geneTable, #geneTable thead, #geneTable tbody, #geneTable tr, #geneTable td, #geneTable th {{
-            background-color: white !important;
-            color: #31333f !important;
-            border-color: #ccc !important;
-        }}
-
-        /* Headers */
-        #geneTable thead th {{
-            font-weight: 600 !important;
-        }}
-
-        /* Search inputs */
-        #geneTable input {{
-            background-color: white !important;
-            color: #31333f !important;
-            font-size: 14px !important;
-            border: 1px solid #ccc !important;
-        }}
-
-        /* Entry selections */
-        .dataTables_length select {{
-            background-color: white !important;
-            color: #31333f !important;
-            border: 1px solid #ccc !important;
-            font-size: 14px !important;
-        }}
-
-        /* Results info */
-        .dataTables_info {{
-            color: #31333f !important;
-        }}
-
-        /* Pages */
-        .dataTables_paginate a {{
-            color: #31333f !important;
-            font-size: 14px !important;
-            font-weight: normal !important;
-            padding: 6px 12px;
-            border-radius: 6px;
-            text-decoration: none;
-            margin: 0 2px;
-        }}
-
-        .dataTables_paginate a.current {{
-            background-color: #f0f0f0 !important;
-            font-weight: bold !important;
-            border: 1px solid #aaa !important;
-        }}
-
-        .dataTables_paginate a:hover {{
-            background-color: #e3e3e3 !important;
-        }}
-        </style>
-
-        <script>
-        $(document).ready(function() {{
-            var table = $('#geneTable').DataTable({{
-                scrollCollapse: true,
-                paging: true,
-                orderCellsTop: true,
-                fixedHeader: true
-            }});
-
-            // Add search inputs to each column
-            $('#geneTable thead tr').clone(true).appendTo('#geneTable thead');
-            $('#geneTable thead tr:eq(1) th').each(function(i) {{
-                var title = $(this).text();
-                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-
-                $('input', this).on('keyup change', function () {{
-                    if (table.column(i).search() !== this.value) {{
-                        table.column(i).search(this.value).draw();
-                    }}
-                }});
-            }});
-        }});
-        </script>
-
-        <div style="overflow-x:auto; margin-bottom: 0px;"">
-        {html_table}
-        </div>
-        """
-
-        height = estimate_table_height(df_genes)
-        
-        # Show table
-        components.html(html_code, height=height, scrolling=True)
+        # Paginated table, filtered and sorted on the server
+        df_genes = demo.table("genes")
+        render_table(df_genes, key="geneTable")
         
         # Download button
         st.download_button(
@@ -299,32 +198,12 @@ if mesh_id:
             "genes.csv",
             "text/csv")
         
-        df_genes["Gene Name_raw"] = df_genes["Gene Name"]
-
-        gname_fc = df_genes.groupby("Gene Name_raw", as_index=False)["log_2 fold change"].sum()
-        gname_fc = gname_fc.sort_values("log_2 fold change", ascending=False)
-
-        # Graph for genes and their log2 fold change
-        fig = px.bar(
-            gname_fc,
-            x="Gene Name_raw",
-            y="log_2 fold change",
-            color="log_2 fold change",
-            color_continuous_scale="sunset",
-            title="Sum of log₂ fold change per gene",
-            labels={"Gene Name_raw": "Gene Name", "log_2 fold change": "Sum of log₂ fold change"},
-            height=500,
-            width=2000
-        )
-
-        st.plotly_chart(fig, width="stretch")
+        # Graph for genes and their log2 fold change: top and bottom genes, then all genes by rank
+        st.plotly_chart(fold_change_chart(df_genes), width="stretch")
 
         
         # Step 5: Search biotype and tractability for the genes in Open Targets
-        with st.spinner("Checking Open Targets..."):
-            time.sleep(1)
-        #default file
-        openTargets_df = pd.read_csv("../assets/demoData/openTargets_genes.csv", sep=",")
+        openTargets_df = demo.table("open_targets")
         if True:
             if True:
                 st.markdown("# Genes with Tractability (Open Targets)")
@@ -335,107 +214,7 @@ if mesh_id:
                     [Open Targets Tractability Overview](https://platform-docs.opentargets.org/target/tractability).
                     """
                 )
-                html_ot_table = openTargets_df.to_html(escape=False, index=False, table_id="openTargetsTable")
-
-                html_ot_scroll = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                    /* Apply style to whole table */
-                    .dataTables_wrapper, .dataTables_wrapper * {{
-                        font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                        color: #31333f !important;
-                        font-size: 15px !important;
-                    }}
-
-                    /* Table */
-                    #openTargetsTable, #openTargetsTable thead, #openTargetsTable tbody, #openTargetsTable tr, #openTargetsTable td, #openTargetsTable th {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        border-color: #ccc !important;
-                    }}
-
-                    /* Headers */
-                    #openTargetsTable thead th {{
-                        font-weight: 600 !important;
-                    }}
-
-                    /* Search inputs */
-                    #openTargetsTable input {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        font-size: 14px !important;
-                        border: 1px solid #ccc !important;
-                    }}
-
-                    /* Entry selections */
-                    .dataTables_length select {{
-                        background-color: white !important;
-                        color: #31333f !important;
-                        border: 1px solid #ccc !important;
-                        font-size: 14px !important;
-                    }}
-
-                    /* Results info */
-                    .dataTables_info {{
-                        color: #31333f !important;
-                    }}
-
-                    /* Pages */
-                    .dataTables_paginate a {{
-                        color: #31333f !important;
-                        font-size: 14px !important;
-                        font-weight: normal !important;
-                        padding: 6px 12px;
-                        border-radius: 6px;
-                        text-decoration: none;
-                        margin: 0 2px;
-                    }}
-
-                    .dataTables_paginate a.current {{
-                        background-color: #f0f0f0 !important;
-                        font-weight: bold !important;
-                        border: 1px solid #aaa !important;
-                    }}
-
-                    .dataTables_paginate a:hover {{
-                        background-color: #e3e3e3 !important;
-                    }}
-                    </style>
-
-                    <script>
-                    $(document).ready(function() {{
-                        var table = $('#openTargetsTable').DataTable({{
-                            scrollCollapse: true,
-                            paging: true,
-                            orderCellsTop: true,
-                            fixedHeader: true
-                        }});
-
-                        // Add search inputs to each column
-                        $('#openTargetsTable thead tr').clone(true).appendTo('#openTargetsTable thead');
-                        $('#openTargetsTable thead tr:eq(1) th').each(function(i) {{
-                            var title = $(this).text();
-                            $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-
-                            $('input', this).on('keyup change', function () {{
-                                if (table.column(i).search() !== this.value) {{
-                                    table.column(i).search(this.value).draw();
-                                }}
-                            }});
-                        }});
-                    }});
-                    </script>
-                    
-                    <div style="overflow-x:auto">
-                        {html_ot_table}
-                    </div>
-                """
-                
-                height = estimate_table_height(openTargets_df)
-                components.html(html_ot_scroll, height=height+200, scrolling=True)
+                render_table(openTargets_df, key="openTargetsTable")
                 
                 st.download_button(
                     "📥 Download results from Open Targets",
@@ -444,11 +223,8 @@ if mesh_id:
                     "text/csv"
                 )
 
-                openTargets_df["Tractability_raw"] = openTargets_df["Tractability"]
-                openTargets_df["Biotype_raw"] = openTargets_df["Biotype"]
-
-                tract_tags = openTargets_df["Tractability_raw"].explode()
-                bio_tags = openTargets_df["Biotype_raw"].explode()
+                tract_tags = openTargets_df["Tractability"].explode()
+                bio_tags = openTargets_df["Biotype"].explode()
 
                 tract_counts = tract_tags.value_counts().reset_index()
                 tract_counts.columns = ["Tractability", "Count"]
@@ -508,108 +284,10 @@ if mesh_id:
             if number_pathways:
                 try:
                     number_pathways = int(number_pathways)
-                    #default file
-                    top_pathways = pd.read_csv("../assets/demoData/topPathways.csv", sep=",")
+                    top_pathways = demo.table("top_pathways")
 
                     if top_pathways is not None:
-                        html_pathway_table = top_pathways[["Reactome Link", "Adjusted P-value", "-log10(Adj P)", "Overlap", "Input %", "Sum log2fc"]].to_html(escape=False, index=False, table_id="topPathwayTable")
-                        
-                        html_code_top_pathways = f"""
-                        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                        <style>
-                            body, .dataTables_wrapper, .dataTables_wrapper * {{
-                                font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                                color: #31333f !important;
-                                font-size: 15px !important;
-                            }}
-
-                            #topPathwayTable {{
-                                width: 100% !important;
-                            }}
-
-                            #topPathwayTable, #topPathwayTable thead, #topPathwayTable tbody, #topPathwayTable tr, #topPathwayTable td, #topPathwayTable th {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border-color: #ccc !important;
-                            }}
-
-                            #topPathwayTable thead th {{
-                                font-weight: 600 !important;
-                            }}
-
-                            #topPathwayTable input {{
-                                width: 100%;
-                                box-sizing: border-box;
-                                background-color: white !important;
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                border: 1px solid #ccc !important;
-                            }}
-
-                            .dataTables_length select {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border: 1px solid #ccc !important;
-                                font-size: 14px !important;
-                            }}
-
-                            .dataTables_info {{
-                                color: #31333f !important;
-                            }}
-
-                            .dataTables_paginate a {{
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                font-weight: normal !important;
-                                padding: 6px 12px;
-                                border-radius: 6px;
-                                text-decoration: none;
-                                margin: 0 2px;
-                            }}
-
-                            .dataTables_paginate a.current {{
-                                background-color: #f0f0f0 !important;
-                                font-weight: bold !important;
-                                border: 1px solid #aaa !important;
-                            }}
-
-                            .dataTables_paginate a:hover {{
-                                background-color: #e3e3e3 !important;
-                            }}
-                        </style>
-
-                        <script>
-                            $(document).ready(function() {{
-                                var table = $('#topPathwayTable').DataTable({{
-                                    scrollCollapse: true,
-                                    paging: true,
-                                    orderCellsTop: true,
-                                    fixedHeader: false,
-                                    autoWidth: false
-                                }});
-
-                                $('#topPathwayTable thead tr').clone(true).appendTo('#topPathwayTable thead');
-                                $('#topPathwayTable thead tr:eq(1) th').each(function(i) {{
-                                    var title = $(this).text();
-                                    $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                                }});
-
-                                $('#topPathwayTable thead').on('keyup change', 'input', function () {{
-                                    let i = $(this).parent().index();
-                                    table.column(i).search(this.value).draw();
-                                }});
-                            }});
-                        </script>
-
-                        <div style="overflow-x:auto">
-                            {html_pathway_table}
-                        </div>
-                        """
-                        height = estimate_table_height(top_pathways)
-                        components.html(html_code_top_pathways, height=height, scrolling=True)
+                        render_table(top_pathways[["Reactome Link", "Adjusted P-value", "-log10(Adj P)", "Overlap", "Input %", "Sum log2fc"]], key="topPathwayTable")
                         
                         st.download_button(
                             "📥 Download Top N pathways CSV",
@@ -627,119 +305,14 @@ if mesh_id:
                         # Get full row of selected pathway
                         selected_pathway_row = top_pathways[top_pathways["Term"] == selected_pathway].iloc[0]
 
-                        # Get overlapping genes for that pathway
-                        #default file path for csv files of top 10 pathways
-                        folder_path = Path("../assets/demoData/all_pathway_genes_csvs") 
-
                         # Display pathway name
                         st.subheader(f"{selected_pathway}")
 
-                        file_name = f"{selected_pathway.replace(' ', '_')}.csv"
-                        matching_file = folder_path / file_name
-                        pathway_genes_newNames = pd.read_csv(matching_file, sep=",")
+                        # Overlapping genes of the pathway, sliced from the demo bundle by Reactome id
+                        pathway_genes_newNames = demo.pathway_table("pathway_genes", selected_pathway)
                         
-                        # Render HTML table with scroll
-                        html_genespathway_table = pathway_genes_newNames.to_html(escape=False, index=False, table_id="pathwayGeneTable")
-
-
-                        # HTML and DataTables JS
-                        html_code_pathway = f"""
-                        <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                        <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                        <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                        <style>
-                            .dataTables_wrapper, .dataTables_wrapper * {{
-                                font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                                color: #31333f !important;
-                                font-size: 15px !important;
-                            }}
-
-                            #pathwayGeneTable {{
-                                width: 100% !important;
-                            }}
-
-                            #pathwayGeneTable, #pathwayGeneTable thead, #pathwayGeneTable tbody, #pathwayGeneTable tr, #pathwayGeneTable td, #pathwayGeneTable th {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border-color: #ccc !important;
-                            }}
-
-                            #pathwayGeneTable thead th {{
-                                font-weight: 600 !important;
-                            }}
-
-                            #pathwayGeneTable input {{
-                                width: 100%;
-                                box-sizing: border-box;
-                                background-color: white !important;
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                border: 1px solid #ccc !important;
-                            }}
-
-                            .dataTables_length select {{
-                                background-color: white !important;
-                                color: #31333f !important;
-                                border: 1px solid #ccc !important;
-                                font-size: 14px !important;
-                            }}
-
-                            .dataTables_info {{
-                                color: #31333f !important;
-                            }}
-
-                            .dataTables_paginate a {{
-                                color: #31333f !important;
-                                font-size: 14px !important;
-                                font-weight: normal !important;
-                                padding: 6px 12px;
-                                border-radius: 6px;
-                                text-decoration: none;
-                                margin: 0 2px;
-                            }}
-
-                            .dataTables_paginate a.current {{
-                                background-color: #f0f0f0 !important;
-                                font-weight: bold !important;
-                                border: 1px solid #aaa !important;
-                            }}
-
-                            .dataTables_paginate a:hover {{
-                                background-color: #e3e3e3 !important;
-                            }}
-                        </style>
-
-                        <script>
-                            $(document).ready(function() {{
-                                var table = $('#pathwayGeneTable').DataTable({{
-                                    scrollCollapse: true,
-                                    paging: true,
-                                    orderCellsTop: true,
-                                    fixedHeader: false,
-                                    autoWidth: false
-                                }});
-
-                                $('#pathwayGeneTable thead tr').clone(true).appendTo('#pathwayGeneTable thead');
-                                $('#pathwayGeneTable thead tr:eq(1) th').each(function(i) {{
-                                    var title = $(this).text();
-                                    $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                                }});
-
-                                $('#pathwayGeneTable thead').on('keyup change', 'input', function () {{
-                                    let i = $(this).parent().index();
-                                    table.column(i).search(this.value).draw();
-                                }});
-                            }});
-                        </script>
-
-                        <div style="overflow-x:auto">
-                            {html_genespathway_table}
-                        </div>
-                        """
-
-                        height = estimate_table_height(pathway_genes_newNames)
-                        components.html(html_code_pathway, height=height, scrolling=True)
+                        # Paginated table with links
+                        render_table(pathway_genes_newNames, key="pathwayGeneTable")
 
                         st.download_button(
                             "📥 Download Important Genes CSV",
@@ -761,112 +334,11 @@ if mesh_id:
                     )
                     selected_pathway_row = top_pathways[top_pathways["Term"] == selected_pathway].iloc[0]
 
-                    #default path for csv files of top 10 pathways
-                    folder_path = Path("../assets/demoData/all_drug_csvs") 
-                    file_name = f"{selected_pathway.replace(' ', '_')}_drugs.csv"
-                    matching_file = folder_path / file_name
-                    drug_df = pd.read_csv(matching_file, sep=",")
+                    drug_df = demo.pathway_table("pathway_drugs", selected_pathway)
 
                 if not drug_df.empty:                    
-                    # HTML table
-                    html_drug_table = drug_df.to_html(escape=False, index=False, table_id="drugTable")
-
-                    html_code_drug = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                        .dataTables_wrapper, .dataTables_wrapper * {{
-                            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                            color: #31333f !important;
-                            font-size: 15px !important;
-                        }}
-
-                        #drugTable {{
-                            width: 100% !important;
-                        }}
-
-                        #drugTable, #drugTable thead, #drugTable tbody, #drugTable tr, #drugTable td, #drugTable th {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border-color: #ccc !important;
-                        }}
-
-                        #drugTable thead th {{
-                            font-weight: 600 !important;
-                        }}
-
-                        #drugTable input {{
-                            width: 100%;
-                            box-sizing: border-box;
-                            background-color: white !important;
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            border: 1px solid #ccc !important;
-                        }}
-
-                        .dataTables_length select {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border: 1px solid #ccc !important;
-                            font-size: 14px !important;
-                        }}
-
-                        .dataTables_info {{
-                            color: #31333f !important;
-                        }}
-
-                        .dataTables_paginate a {{
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            font-weight: normal !important;
-                            padding: 6px 12px;
-                            border-radius: 6px;
-                            text-decoration: none;
-                            margin: 0 2px;
-                        }}
-
-                        .dataTables_paginate a.current {{
-                            background-color: #f0f0f0 !important;
-                            font-weight: bold !important;
-                            border: 1px solid #aaa !important;
-                        }}
-
-                        .dataTables_paginate a:hover {{
-                            background-color: #e3e3e3 !important;
-                        }}
-                    </style>
-
-                    <script>
-                        $(document).ready(function() {{
-                            var table = $('#drugTable').DataTable({{
-                                scrollCollapse: true,
-                                paging: true,
-                                orderCellsTop: true,
-                                fixedHeader: false,
-                                autoWidth: false
-                            }});
-
-                            $('#drugTable thead tr').clone(true).appendTo('#drugTable thead');
-                            $('#drugTable thead tr:eq(1) th').each(function(i) {{
-                                var title = $(this).text();
-                                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                            }});
-
-                            $('#drugTable thead').on('keyup change', 'input', function () {{
-                                let i = $(this).parent().index();
-                                table.column(i).search(this.value).draw();
-                            }});
-                        }});
-                    </script>
-
-                    <div style="overflow-x:auto">
-                        {html_drug_table}
-                    </div>
-                    """
-                    height = estimate_table_height(drug_df)
-                    components.html(html_code_drug, height=height, scrolling=True)                    
+                    # Paginated table with links
+                    render_table(drug_df, key="drugTable")
         
                     st.download_button("📥 Download Drug Interactions CSV", drug_df.to_csv(index=False), "drug_interactions.csv", "text/csv")
                     
@@ -953,110 +425,11 @@ if mesh_id:
             if True:
                 
                 # Apply to your merged table
-                #default file
-                merged_with_links = pd.read_csv("../assets/demoData/full_results_table.csv", sep=",")
-                merged_with_links = merged_with_links.fillna("NaN")
+                merged_with_links = demo.table("full_results").fillna("NaN")
 
                 st.markdown("## 📦 Download Full Results Table")
                 
-                html_final_table = merged_with_links.to_html(escape=False, index=False, table_id="finalTable")
-
-                html_code_final = f"""
-                    <link rel="stylesheet" href="https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css">
-                    <script src="https://code.jquery.com/jquery-3.6.0.min.js"></script>
-                    <script src="https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js"></script>
-
-                    <style>
-                        .dataTables_wrapper, .dataTables_wrapper * {{
-                            font-family: "Segoe UI", "Helvetica", "Arial", sans-serif !important;
-                            color: #31333f !important;
-                            font-size: 12px !important;
-                        }}
-
-                        #finalTable {{
-                            width: 100% !important;
-                        }}
-
-                        #finalTable, #finalTable thead, #finalTable tbody, #finalTable tr, #finalTable td, #finalTable th {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border-color: #ccc !important;
-                        }}
-
-                        #finalTable thead th {{
-                            font-weight: 600 !important;
-                        }}
-
-                        #finalTable input {{
-                            width: 100%;
-                            box-sizing: border-box;
-                            background-color: white !important;
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            border: 1px solid #ccc !important;
-                        }}
-
-                        .dataTables_length select {{
-                            background-color: white !important;
-                            color: #31333f !important;
-                            border: 1px solid #ccc !important;
-                            font-size: 14px !important;
-                        }}
-
-                        .dataTables_info {{
-                            color: #31333f !important;
-                        }}
-
-                        .dataTables_paginate a {{
-                            color: #31333f !important;
-                            font-size: 14px !important;
-                            font-weight: normal !important;
-                            padding: 6px 12px;
-                            border-radius: 6px;
-                            text-decoration: none;
-                            margin: 0 2px;
-                        }}
-
-                        .dataTables_paginate a.current {{
-                            background-color: #f0f0f0 !important;
-                            font-weight: bold !important;
-                            border: 1px solid #aaa !important;
-                        }}
-
-                        .dataTables_paginate a:hover {{
-                            background-color: #e3e3e3 !important;
-                        }}
-                    </style>
-
-                    <script>
-                        $(document).ready(function() {{
-                            var table = $('#finalTable').DataTable({{
-                                scrollCollapse: true,
-                                paging: true,
-                                orderCellsTop: true,
-                                fixedHeader: false,
-                                autoWidth: false
-                            }});
-
-                            $('#finalTable thead tr').clone(true).appendTo('#finalTable thead');
-                            $('#finalTable thead tr:eq(1) th').each(function(i) {{
-                                var title = $(this).text();
-                                $(this).html('<input type="text" placeholder="Search ' + title + '" />');
-                            }});
-
-                            $('#finalTable thead').on('keyup change', 'input', function () {{
-                                let i = $(this).parent().index();
-                                table.column(i).search(this.value).draw();
-                            }});
-                        }});
-                    </script>
-
-                    <div style="overflow-x:auto">
-                        {html_final_table}
-                    </div>
-                    """
-                height = estimate_table_height(merged_with_links)
-                components.html(html_code_final, height=height, scrolling=True)
+                render_table(merged_with_links, key="finalTable", font_size=12)
 
                 st.download_button(
                         "📥 Download Full Combined CSV",
@@ -1108,15 +481,10 @@ if mesh_id:
                     if not selected:
                         st.warning("Select at least one table to enable the download.")
                     else:
-                        zip_buf = io.BytesIO()
-                        with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                            for fname, df in selected:
-                                zf.writestr(fname, df.to_csv(index=False))
-                        zip_buf.seek(0)
-
+                        # The archive is only built when the button is clicked
                         st.download_button(
                             label="📥 Download selected (.zip)",
-                            data=zip_buf.getvalue(),
+                            data=lambda: zip_bytes(selected),
                             file_name=f"selected_tables_{datetime.date.today().isoformat()}.zip",
                             mime="application/zip",
                             key="zip_download_btn"
@@ -1148,28 +516,12 @@ if mesh_id:
 
                     if st.button("Generate and Download Tables"):
                         with st.spinner("Generating all CSVs..."):
-                            drug_csvs = save_drug_csvs(df_genes, top_pathways)
-                            pathway_csvs = save_pathway_csvs(df_genes, top_pathways)
-
-                            # Build ZIP in memory
-                            zip_buf = io.BytesIO()
-                            with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-                                # Add pathway CSVs
-                                for fname, data in pathway_csvs.items():
-                                    zf.writestr(fname, data)
-                                # Add drug CSVs
-                                for fname, data in drug_csvs.items():
-                                    zf.writestr(fname, data)
-                                # Add any extra files
-                                for f in extra_files:
-                                    if os.path.exists(f):
-                                        zf.write(f, arcname=os.path.basename(f))
-
-                            zip_buf.seek(0)
+                            # Precomputed pathway and drug CSVs, streamed into the archive one by one
+                            zip_data = zip_bytes(demo.iter_pathway_tables(top_pathways["Term"]), extra_files)
 
                         st.download_button(
                             label="📥 Download All Tables",
-                            data=zip_buf.getvalue(),
+                            data=zip_data,
                             file_name="all_tables.zip",
                             mime="application/zip"
                         )
@@ -0,0 +1,6 @@
+import sys
+
+from tractome.cli import main
+
+
+sys.exit(main())
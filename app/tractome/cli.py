@@ -0,0 +1,198 @@
+"""
+Headless entry point of the Tractome pipeline, for batch processing without the Streamlit UI.
+
+    python -m tractome run --mesh D003110 --tsv colorectal.tsv --out results/
+    python -m tractome run --manifest inputs.csv --out results/ --jobs 8
+
+Must not import Streamlit or plotly.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from Bio import Entrez
+
+from utils.instrumentation import track_run, track_stage
+from utils.pipeline import (get_disease_name, read_expression_tsv, fetch_gene_names,
+                            find_possible_targets_of_drugs, analyze_pathways,
+                            get_drug_targets_dgidb_graphql, build_full_results_table,
+                            iter_pathway_tables, iter_drug_tables, gene_keys, GENE_KEY,
+                            EXPRESSION_MIN_LOG2FC, EXPRESSION_MAX_PVALUE)
+from utils.export import write_csv
+from utils.concurrency import UPSTREAM_CONCURRENCY
+from utils.ratelimit import UPSTREAM_RATES
+
+
+def _write_tables(tables, folder):
+    """
+    Writes the (filename, table) pairs yielded by iter_pathway_tables/iter_drug_tables to a folder.
+    """
+    os.makedirs(folder, exist_ok=True)
+    for fname, df in tables:
+        with open(os.path.join(folder, fname), "w", encoding="utf-8", newline="") as f:
+            write_csv(f, df)
+
+
+def _share_upstream_limits(workers):
+    """
+    Initializer of the worker processes. Rate limits and concurrency are enforced per process, so each
+    of the workers gets its share of them and the batch run as a whole stays within the configured limits.
+    Concurrency is at least 1 per process.
+    """
+    for upstream, rate in UPSTREAM_RATES.items():
+        UPSTREAM_RATES[upstream] = rate / workers
+    for upstream, concurrency in UPSTREAM_CONCURRENCY.items():
+        UPSTREAM_CONCURRENCY[upstream] = max(1, concurrency // workers)
+
+
+def run_analysis(mesh_id, tsv_path, out_dir, number_pathways=10, email=None,
+                 min_log2fc=EXPRESSION_MIN_LOG2FC, max_pvalue=EXPRESSION_MAX_PVALUE):
+    """
+    Runs the whole pipeline for one MeSH ID and Expression Atlas TSV and writes every table to out_dir.
+    Only rows with a fold change above min_log2fc and an adjusted p-value at most max_pvalue are analyzed.
+    Returns out_dir.
+    """
+    if email:
+        Entrez.email = email
+    os.makedirs(out_dir, exist_ok=True)
+
+    with track_run(mesh_id) as run:
+        with track_stage("disease"):
+            disease = get_disease_name(mesh_id)
+            disease_name, disease_url = disease or (None, None)
+
+        failed_genes, failed_targets, failed_drugs = [], [], []
+        with track_stage("genes"):
+            df_selected = fetch_gene_names(read_expression_tsv(tsv_path, min_log2fc, max_pvalue), failed_genes)
+            df_selected.drop(columns=[GENE_KEY]).sort_values("log_2 fold change", ascending=False).to_csv(os.path.join(out_dir, "genes.csv"), index=False)
+
+        with track_stage("open_targets"):
+            openTargets_results = find_possible_targets_of_drugs(df_selected["Gene"].tolist(), failed_targets)
+            openTargets_df = pd.DataFrame([r for r in openTargets_results if r is not None])
+            if not openTargets_df.empty:
+                openTargets_df = openTargets_df.drop(columns=["Name"], errors="ignore").sort_values("Gene Symbol")
+                openTargets_df["Tractability"] = openTargets_df["Tractability"].str.join("; ")
+                if "Genetic Constraint" in openTargets_df.columns:
+                    openTargets_df["Genetic Constraint"] = openTargets_df["Genetic Constraint"].apply(json.dumps)
+            openTargets_df.to_csv(os.path.join(out_dir, "openTargets_genes.csv"), index=False)
+
+        with track_stage("drugs"):
+            all_gene_names = gene_keys(df_selected).unique().tolist()
+            all_drug_df = get_drug_targets_dgidb_graphql(all_gene_names, failed_drugs)
+        for upstream, failed in (("Ensembl", failed_genes), ("Open Targets", failed_targets), ("DGIdb", failed_drugs)):
+            if failed:
+                print(f"{mesh_id}: {upstream} could not be reached for {len(failed)} genes, their results are missing", file=sys.stderr)
+
+        with track_stage("pathways"):
+            top_pathways = analyze_pathways(df_selected, number_pathways)
+            if isinstance(top_pathways, pd.DataFrame):
+                top_pathways.to_csv(os.path.join(out_dir, "topPathways.csv"), index=False)
+                _write_tables(iter_pathway_tables(df_selected, top_pathways), os.path.join(out_dir, "all_pathway_genes_csvs"))
+                _write_tables(iter_drug_tables(df_selected, top_pathways, all_drug_df), os.path.join(out_dir, "all_drug_csvs"))
+            else:
+                top_pathways = None
+
+        with track_stage("summary"):
+            full = build_full_results_table(df_selected, openTargets_df, all_drug_df, top_pathways)
+            full.to_csv(os.path.join(out_dir, "full_results_table.csv"), index=False)
+
+    with open(os.path.join(out_dir, "metadata.json"), "w") as f:
+        json.dump({
+            "mesh_id": mesh_id,
+            "disease": disease_name,
+            "disease_url": disease_url,
+            "tsv": os.path.abspath(tsv_path),
+            "number_pathways": number_pathways,
+            "min_log2fc": min_log2fc,
+            "max_pvalue": max_pvalue,
+            "failed_ensembl": failed_genes,
+            "failed_open_targets": failed_targets,
+            "failed_dgidb": failed_drugs,
+            "timings": run.table().to_dict(orient="records"),
+            "created_iso": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }, f, indent=2)
+
+    return out_dir
+
+
+def _read_manifest(path):
+    """
+    Reads a CSV manifest with mesh_id and tsv columns (and optionally out) into a list of dicts.
+    """
+    with open(path, newline="") as f:
+        return [row for row in csv.DictReader(f)]
+
+
+def _build_jobs(args):
+    """
+    Pairs the --mesh/--tsv arguments and manifest rows into (mesh_id, tsv, out_dir) jobs.
+    A single job writes straight to --out; several jobs get one subfolder each.
+    """
+    inputs = [(mesh_id, tsv, None) for mesh_id, tsv in zip(args.mesh or [], args.tsv or [])]
+    base_dir = Path(args.manifest).parent if args.manifest else Path(".")
+    for row in _read_manifest(args.manifest) if args.manifest else []:
+        inputs.append((row["mesh_id"], str(base_dir / row["tsv"]), row.get("out") or None))
+
+    jobs = []
+    for mesh_id, tsv, out in inputs:
+        if out is None:
+            out = args.out if len(inputs) == 1 else os.path.join(args.out, f"{mesh_id}_{Path(tsv).stem}")
+        jobs.append((mesh_id, tsv, out))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tractome", description="Run the Tractome pipeline without the web interface.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Analyze one or more MeSH ID / Expression Atlas TSV pairs.")
+    run.add_argument("--mesh", action="append", help="MeSH ID, repeat for several inputs (paired in order with --tsv)")
+    run.add_argument("--tsv", action="append", help="Expression Atlas differential expression TSV")
+    run.add_argument("--manifest", help="CSV with mesh_id,tsv[,out] columns, one analysis per row")
+    run.add_argument("--out", required=True, help="Output folder")
+    run.add_argument("--pathways", type=int, default=10, help="Number of top pathways (default 10)")
+    run.add_argument("--min-log2fc", type=float, default=EXPRESSION_MIN_LOG2FC, help="Keep rows with a log2 fold change above this")
+    run.add_argument("--max-pvalue", type=float, default=EXPRESSION_MAX_PVALUE, help="Keep rows with an adjusted p-value at most this")
+    run.add_argument("--email", default=os.environ.get("TRACTOME_ENTREZ_EMAIL"), help="E-mail for Entrez searches")
+    run.add_argument("--jobs", type=int, default=1,
+                     help="Analyses run in parallel processes, which share the upstream rate limits (default 1)")
+
+    args = parser.parse_args(argv)
+    if len(args.mesh or []) != len(args.tsv or []):
+        parser.error("--mesh and --tsv must be given the same number of times")
+    jobs = _build_jobs(args)
+    if not jobs:
+        parser.error("nothing to run, give --mesh/--tsv or --manifest")
+
+    failures = 0
+    if len(jobs) == 1 or args.jobs <= 1:
+        for mesh_id, tsv, out in jobs:
+            try:
+                run_analysis(mesh_id, tsv, out, args.pathways, args.email, args.min_log2fc, args.max_pvalue)
+                print(f"{mesh_id} {tsv}: {out}")
+            except Exception as e:
+                failures += 1
+                print(f"{mesh_id} {tsv}: failed ({e})", file=sys.stderr)
+        return 1 if failures else 0
+
+    workers = min(args.jobs, len(jobs))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_share_upstream_limits, initargs=(workers,)) as executor:
+        futures = {
+            executor.submit(run_analysis, mesh_id, tsv, out, args.pathways, args.email, args.min_log2fc, args.max_pvalue): (mesh_id, tsv)
+            for mesh_id, tsv, out in jobs
+        }
+        for future in as_completed(futures):
+            mesh_id, tsv = futures[future]
+            try:
+                print(f"{mesh_id} {tsv}: {future.result()}")
+            except Exception as e:
+                failures += 1
+                print(f"{mesh_id} {tsv}: failed ({e})", file=sys.stderr)
+
+    return 1 if failures else 0
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from utils.http_client import get_session, UPSTREAM_URLS
+from utils.instrumentation import record_cache
+
+
+CACHE_PATH = os.environ.get(
+    "TRACTOME_CACHE_PATH",
+    str(Path.home() / ".cache" / "tractome" / "annotations.sqlite")
+)
+CACHE_TTL = int(os.environ.get("TRACTOME_CACHE_TTL", 30 * 24 * 3600))  # Seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("TRACTOME_CACHE_MAX_ENTRIES", 500000))
+CACHE_DISABLED = os.environ.get("TRACTOME_CACHE_DISABLED", "") not in ("", "0")
+
+# Keeps the number of bound parameters per statement below SQLite's limit
+SQLITE_CHUNK_SIZE = 500
+# Entries written by a process between two evictions of expired and least recently used entries
+CACHE_EVICT_EVERY = 5000
+
+_local = threading.local()
+_releases = {}
+# Entries written since the last eviction; starts full so the first write of a process evicts
+_writes_since_eviction = CACHE_EVICT_EVERY
+_eviction_lock = threading.Lock()
+
+
+def _connect():
+    """
+    Returns the cache connection of the current thread, creating the database if needed.
+    Every thread (Streamlit session or worker) gets its own connection; WAL mode lets
+    readers and a writer work on the same file concurrently.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS annotations (
+                source TEXT NOT NULL,
+                release TEXT NOT NULL,
+                query TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, release, query)
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_annotations_accessed ON annotations (accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_annotations_created ON annotations (created_at)")
+        _local.conn = conn
+    return conn
+
+
+def get_upstream_release(source):
+    """
+    Returns the data release currently served by an upstream API, so that cached
+    annotations are invalidated when the upstream database is updated.
+    Can be pinned with TRACTOME_<SOURCE>_RELEASE; "unknown" if it cannot be retrieved.
+    """
+    pinned = os.environ.get(f"TRACTOME_{source.upper()}_RELEASE")
+    if pinned:
+        return pinned
+    if source in _releases:
+        return _releases[source]
+
+    release = None
+    try:
+        if source == "ensembl":
+            r = get_session("ensembl").get(f"{UPSTREAM_URLS['ensembl']}/info/data?content-type=application/json", timeout=10)
+            if r.status_code == 200:
+                release = str(r.json()["releases"][0])
+        elif source == "opentargets":
+            r = get_session("opentargets").post(
+                UPSTREAM_URLS["opentargets"],
+                json={"query": "{ meta { dataVersion { year month } } }"},
+                timeout=10
+            )
+            if r.status_code == 200:
+                version = r.json()["data"]["meta"]["dataVersion"]
+                release = f"{version['year']}.{version['month']}"
+        elif source == "mesh":
+            # MeSH is released once a year
+            release = time.strftime("%Y")
+        else:
+            # DGIdb does not publish a release number through its API
+            release = "current"
+    except Exception:
+        release = None
+
+    if release is None:
+        # Not memoized, so the release is retried on the next lookup
+        return "unknown"
+    _releases[source] = release
+    return release
+
+
+def cache_get_many(source, queries):
+    """
+    Returns a dict with the cached value of every query that is stored and not expired.
+    Queries missing from the dict must be fetched from the upstream API.
+    """
+    queries = list(dict.fromkeys(queries))
+    if CACHE_DISABLED or not queries:
+        return {}
+
+    release = get_upstream_release(source)
+    now = time.time()
+    hits = {}
+    try:
+        conn = _connect()
+        for start in range(0, len(queries), SQLITE_CHUNK_SIZE):
+            chunk = queries[start:start + SQLITE_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT query, value FROM annotations WHERE source = ? AND release = ? "
+                f"AND created_at >= ? AND query IN ({placeholders})",
+                [source, release, now - CACHE_TTL, *chunk]
+            ).fetchall()
+            for query, value in rows:
+                hits[query] = json.loads(value)
+            if rows:
+                conn.execute(
+                    f"UPDATE annotations SET accessed_at = ? WHERE source = ? AND release = ? "
+                    f"AND query IN ({','.join('?' * len(rows))})",
+                    [now, source, release, *(query for query, _ in rows)]
+                )
+    except sqlite3.Error:
+        # A broken or locked cache must never break an analysis
+        pass
+    record_cache(source, len(hits), len(queries) - len(hits))
+    return hits
+
+
+def _evict(conn):
+    """
+    Deletes expired entries and, when the cache is over CACHE_MAX_ENTRIES, the least recently used ones.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM annotations WHERE created_at < ?", (time.time() - CACHE_TTL,))
+        excess = conn.execute("SELECT COUNT(*) FROM annotations").fetchone()[0] - CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM annotations WHERE rowid IN "
+                "(SELECT rowid FROM annotations ORDER BY accessed_at ASC LIMIT ?)",
+                (excess,)
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def cache_set_many(source, values):
+    """
+    Stores a dict of query -> JSON-serializable value. Expired and least recently used entries
+    are evicted by the first write of the process and then every CACHE_EVICT_EVERY entries written,
+    in their own transaction, so writes do not scan the whole cache. The cache can therefore go
+    over CACHE_MAX_ENTRIES by up to CACHE_EVICT_EVERY entries per process.
+    """
+    global _writes_since_eviction
+    if CACHE_DISABLED or not values:
+        return
+
+    release = get_upstream_release(source)
+    now = time.time()
+    rows = [(source, release, query, json.dumps(value), now, now) for query, value in values.items()]
+    with _eviction_lock:
+        _writes_since_eviction += len(rows)
+        evict = _writes_since_eviction >= CACHE_EVICT_EVERY
+        if evict:
+            _writes_since_eviction = 0
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if evict:
+            _evict(conn)
+    except sqlite3.Error:
+        return
+
+
+def cache_get(source, query, default=None):
+    """
+    Returns the cached value of a single query, or default if it is not cached.
+    """
+    return cache_get_many(source, [query]).get(query, default)
+
+
+def cache_set(source, query, value):
+    """
+    Stores the value of a single query.
+    """
+    cache_set_many(source, {query: value})
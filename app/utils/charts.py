@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+# Genes drawn as bars at each end of the fold change ranking; the others are only on the rank curve
+FOLD_CHANGE_TOP_GENES = int(os.environ.get("TRACTOME_CHART_TOP_GENES", 25))
+# Points of the rank curve sent to the browser, whatever the number of genes
+FOLD_CHANGE_CURVE_POINTS = 2000
+
+FOLD_CHANGE_TITLE = "Sum of log₂ fold change per gene"
+FOLD_CHANGE_LABEL = "Sum of log₂ fold change"
+
+
+def sum_fold_change_per_gene(df):
+    """
+    Sum of log_2 fold change per Gene Name, by decreasing value.
+    """
+    return (
+        df.groupby("Gene Name", as_index=False, observed=True)["log_2 fold change"].sum()
+        .sort_values("log_2 fold change", ascending=False, ignore_index=True)
+    )
+
+
+def _bars(gname_fc):
+    return go.Bar(
+        x=gname_fc["Gene Name"].astype(str),
+        y=gname_fc["log_2 fold change"],
+        marker={"color": gname_fc["log_2 fold change"], "coloraxis": "coloraxis"},
+        hovertemplate="%{x}<br>" + FOLD_CHANGE_LABEL + ": %{y}<extra></extra>",
+    )
+
+
+def _sampled_ranks(n, points):
+    """
+    Ranks 0..n-1 evenly sampled down to at most points, keeping the first and last.
+    """
+    if n <= points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, points).round().astype(np.int64))
+
+
+def fold_change_chart(df, top_n=FOLD_CHANGE_TOP_GENES, curve_points=FOLD_CHANGE_CURVE_POINTS):
+    """
+    Bar chart of the summed log_2 fold change per gene. Up to 2 * top_n genes are all drawn.
+    Above that, only the top_n highest and lowest genes are drawn as bars, over a WebGL curve of
+    every gene by rank sampled to curve_points points, so the figure stays the same size for any
+    number of genes. Since genes are ranked by fold change, the sampled curve keeps its shape.
+    """
+    gname_fc = sum_fold_change_per_gene(df)
+    values = gname_fc["log_2 fold change"]
+    coloraxis = {"colorscale": "sunset", "colorbar": {"title": {"text": FOLD_CHANGE_LABEL}}}
+    if not gname_fc.empty:
+        coloraxis.update(cmin=values.min(), cmax=values.max())
+
+    if len(gname_fc) <= 2 * top_n:
+        fig = go.Figure(_bars(gname_fc))
+        fig.update_layout(title=FOLD_CHANGE_TITLE, coloraxis=coloraxis, height=500,
+                          xaxis_title="Gene Name", yaxis_title=FOLD_CHANGE_LABEL)
+        return fig
+
+    fig = make_subplots(
+        rows=2, cols=1, vertical_spacing=0.22,
+        subplot_titles=(f"Top and bottom {top_n} of {len(gname_fc)} genes", f"All {len(gname_fc)} genes by rank")
+    )
+    ends = np.r_[0:top_n, len(gname_fc) - top_n:len(gname_fc)]
+    fig.add_trace(_bars(gname_fc.iloc[ends]), row=1, col=1)
+
+    ranks = _sampled_ranks(len(gname_fc), curve_points)
+    sampled = gname_fc.iloc[ranks]
+    fig.add_trace(go.Scattergl(
+        x=ranks + 1,
+        y=sampled["log_2 fold change"],
+        text=sampled["Gene Name"].astype(str),
+        mode="lines+markers",
+        line={"color": "lightgray"},
+        marker={"size": 4, "color": sampled["log_2 fold change"], "coloraxis": "coloraxis"},
+        hovertemplate="%{text} (rank %{x})<br>" + FOLD_CHANGE_LABEL + ": %{y}<extra></extra>",
+    ), row=2, col=1)
+
+    fig.update_layout(title=FOLD_CHANGE_TITLE, coloraxis=coloraxis, height=800, showlegend=False)
+    fig.update_xaxes(title_text="Gene Name", row=1, col=1)
+    fig.update_xaxes(title_text="Rank", row=2, col=1)
+    fig.update_yaxes(title_text=FOLD_CHANGE_LABEL, row=1, col=1)
+    fig.update_yaxes(title_text=FOLD_CHANGE_LABEL, row=2, col=1)
+    return fig
@@ -0,0 +1,50 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Maximum number of simultaneous requests sent to each upstream API
+UPSTREAM_CONCURRENCY = {
+    "ensembl": int(os.environ.get("TRACTOME_ENSEMBL_CONCURRENCY", 4)),
+    "opentargets": int(os.environ.get("TRACTOME_OPENTARGETS_CONCURRENCY", 4)),
+    "dgidb": int(os.environ.get("TRACTOME_DGIDB_CONCURRENCY", 4)),
+}
+DEFAULT_CONCURRENCY = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(upstream):
+    """
+    Returns the thread pool of an upstream API. Pools are shared by all sessions of the
+    process, so the concurrency limit of an upstream holds across users.
+    """
+    executor = _executors.get(upstream)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(upstream)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=UPSTREAM_CONCURRENCY.get(upstream, DEFAULT_CONCURRENCY),
+                    thread_name_prefix=f"tractome-{upstream}"
+                )
+                _executors[upstream] = executor
+    return executor
+
+
+def fan_out(upstream, func, items):
+    """
+    Calls func on every item with at most UPSTREAM_CONCURRENCY[upstream] calls in flight.
+    Results are returned in the order of items; the first exception raised is re-raised.
+    Must not be nested for the same upstream, as the inner calls would wait on the outer ones.
+    The calls run in the context of the caller, so they are instrumented under its stage.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    executor = get_executor(upstream)
+    futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+DEMO_DIR = Path(__file__).resolve().parents[2] / "assets" / "demoData"
+DEMO_BUNDLE_DIR = os.environ.get("TRACTOME_DEMO_BUNDLE", str(DEMO_DIR / "bundle"))
+
+REACTOME_ID = re.compile(r"R-HSA-\d+")
+
+# Bundle table -> CSV it is built from, relative to the demo folder
+DEMO_TABLES = {
+    "expression": ("colorectal.tsv", "\t"),
+    "genes": ("genes.csv", ","),
+    "open_targets": ("openTargets_genes.csv", ","),
+    "top_pathways": ("topPathways.csv", ","),
+    "full_results": ("full_results_table.csv", ","),
+}
+# Bundle table -> folder of per-pathway CSVs, concatenated and indexed by Reactome id
+DEMO_PATHWAY_TABLES = {
+    "pathway_genes": "all_pathway_genes_csvs",
+    "pathway_drugs": "all_drug_csvs",
+}
+
+
+def reactome_id(text):
+    """
+    Returns the Reactome pathway id (R-HSA-...) found in a pathway term or file name, or None.
+    """
+    match = REACTOME_ID.search(str(text))
+    return match.group(0) if match else None
+
+
+def _read_pathway_folder(folder):
+    """
+    Concatenates the per-pathway CSVs of a folder, ordered by Reactome id.
+    Returns the table and {pathway id: [start, stop]} row offsets into it.
+    """
+    parts = {}
+    for path in sorted(Path(folder).glob("*.csv")):
+        pathway_id = reactome_id(path.name)
+        if pathway_id is not None:
+            parts[pathway_id] = pd.read_csv(path)
+    if not parts:
+        return pd.DataFrame(), {}
+
+    offsets = {}
+    start = 0
+    for pathway_id, df in parts.items():
+        offsets[pathway_id] = [start, start + len(df)]
+        start += len(df)
+    return pd.concat(parts.values(), ignore_index=True), offsets
+
+
+def read_demo_tables(demo_dir=DEMO_DIR):
+    """
+    Reads the demo results from their CSVs. Returns ({table name: DataFrame}, index), the
+    index holding the per-pathway row offsets of the pathway tables and the demo metadata.
+    """
+    demo_dir = Path(demo_dir)
+    tables = {name: pd.read_csv(demo_dir / fname, sep=sep) for name, (fname, sep) in DEMO_TABLES.items()}
+    index = {"offsets": {}}
+    for name, folder in DEMO_PATHWAY_TABLES.items():
+        tables[name], index["offsets"][name] = _read_pathway_folder(demo_dir / folder)
+    with open(demo_dir / "metadata.json") as f:
+        index["metadata"] = json.load(f)
+    return tables, index
+
+
+def build_demo_bundle(demo_dir=DEMO_DIR, bundle_dir=DEMO_BUNDLE_DIR):
+    """
+    Packs the demo results into one uncompressed Arrow (Feather v2) file per table, which can be
+    memory-mapped, plus an index.json with the per-pathway row offsets and metadata.
+    Returns the number of tables written.
+    """
+    tables, index = read_demo_tables(demo_dir)
+    os.makedirs(bundle_dir, exist_ok=True)
+    for name, df in tables.items():
+        path = os.path.join(bundle_dir, f"{name}.arrow")
+        feather.write_feather(df, f"{path}.tmp", compression="uncompressed")
+        os.replace(f"{path}.tmp", path)
+    with open(os.path.join(bundle_dir, "index.json"), "w") as f:
+        json.dump(index, f, indent=2)
+    return len(tables)
+
+
+class DemoBundle:
+    """
+    The demo results: whole tables, and per-pathway tables sliced by Reactome id. They are kept as
+    Arrow tables, memory-mapped from the bundle when it has been built (read from the demo CSVs
+    otherwise), and only converted to DataFrames when a page asks for them.
+    """
+    def __init__(self, bundle_dir=DEMO_BUNDLE_DIR, demo_dir=DEMO_DIR):
+        index_path = os.path.join(bundle_dir, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            # Memory-mapped: the operating system shares the pages between server processes,
+            # as long as they are not copied into pandas here
+            arrow = {
+                name: feather.read_table(os.path.join(bundle_dir, f"{name}.arrow"), memory_map=True)
+                for name in [*DEMO_TABLES, *DEMO_PATHWAY_TABLES]
+            }
+        else:
+            frames, index = read_demo_tables(demo_dir)
+            arrow = {name: pa.Table.from_pandas(df, preserve_index=False) for name, df in frames.items()}
+
+        self.metadata = index["metadata"]
+        self.offsets = index["offsets"]
+        self.tables = {name: arrow[name] for name in DEMO_TABLES}
+        self.pathway_tables = {name: arrow[name] for name in DEMO_PATHWAY_TABLES}
+
+    def table(self, name):
+        """
+        One of the DEMO_TABLES, as a new DataFrame converted from the bundle.
+        """
+        return self.tables[name].to_pandas()
+
+    def pathway_table(self, name, pathway):
+        """
+        Rows of a per-pathway table ("pathway_genes" or "pathway_drugs") for a pathway term or
+        Reactome id, as a new DataFrame; empty if the pathway has none. The rows are sliced from
+        the bundle without copying, so only those rows are converted.
+        """
+        table = self.pathway_tables[name]
+        start, stop = self.offsets[name].get(reactome_id(pathway), [0, 0])
+        return table.slice(start, stop - start).to_pandas()
+
+    def iter_pathway_tables(self, terms):
+        """
+        Yields the (filename, table) pairs of the "Generate and Download Tables" archive, named
+        as utils.pipeline.iter_pathway_tables and iter_drug_tables name them.
+        """
+        for name, suffix in (("pathway_genes", "genes"), ("pathway_drugs", "drugs")):
+            for term in terms:
+                df = self.pathway_table(name, term)
+                if not df.empty:
+                    yield f"{term.replace('/', '_').replace(' ', '_')}_{suffix}.csv", df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the columnar bundle of the Demo page results.")
+    parser.add_argument("--demo-dir", default=str(DEMO_DIR), help="Folder of the demo CSVs")
+    parser.add_argument("--out", default=DEMO_BUNDLE_DIR, help="Bundle folder")
+    args = parser.parse_args()
+    print(f"Packed {build_demo_bundle(args.demo_dir, args.out)} tables into {args.out}")
@@ -0,0 +1,177 @@
+import argparse
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+REACTOME_LIBRARY = "Reactome_2022"
+GENESETS_DIR = Path(__file__).resolve().parents[2] / "assets" / "genesets"
+REACTOME_GMT_PATH = os.environ.get("TRACTOME_REACTOME_GMT", str(GENESETS_DIR / f"{REACTOME_LIBRARY}.gmt"))
+
+
+def read_gmt(path):
+    """
+    Reads a GMT file (term, description, genes... separated by tabs) into a dict term -> genes.
+    Enrichr libraries may append a weight to each gene ("GENE,1.0"), which is dropped.
+    """
+    gene_sets = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 3:
+                continue
+            genes = [g.split(",")[0].strip().upper() for g in fields[2:] if g.strip()]
+            gene_sets[fields[0]] = list(dict.fromkeys(genes))
+    return gene_sets
+
+
+def write_gmt(gene_sets, path):
+    """
+    Writes a dict term -> genes as a GMT file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for term, genes in gene_sets.items():
+            f.write("\t".join([term, ""] + list(genes)) + "\n")
+
+
+def download_gene_set_library(library=REACTOME_LIBRARY, path=None):
+    """
+    Downloads an Enrichr gene set library once and stores it as a GMT file named after
+    the library version, so later analyses can run without network access.
+    """
+    import gseapy as gp
+
+    path = path or str(GENESETS_DIR / f"{library}.gmt")
+    write_gmt(gp.get_library(name=library, organism="Human"), path)
+    return path
+
+
+@lru_cache(maxsize=4)
+def load_gene_set_library(path, name=REACTOME_LIBRARY):
+    """
+    Loads a GMT file into a sparse term x gene incidence matrix. Loaded once per process.
+    Returns a dict with the library name, terms, genes, gene -> column index, matrix and term sizes.
+    """
+    from scipy import sparse
+
+    gene_sets = read_gmt(path)
+    terms = list(gene_sets)
+    genes = sorted({gene for members in gene_sets.values() for gene in members})
+    gene_index = {gene: i for i, gene in enumerate(genes)}
+
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(gene_sets[term]) for term in terms])
+    indices = np.fromiter(
+        (gene_index[gene] for term in terms for gene in gene_sets[term]),
+        dtype=np.int32,
+        count=int(indptr[-1])
+    )
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int8), indices, indptr),
+        shape=(len(terms), len(genes))
+    )
+
+    return {
+        "name": name,
+        "terms": np.array(terms, dtype=object),
+        "genes": np.array(genes, dtype=object),
+        "gene_index": gene_index,
+        "matrix": matrix,
+        "sizes": np.diff(indptr),
+    }
+
+
+def load_reactome_library():
+    """
+    Returns the local Reactome library, or None if its GMT file has not been downloaded.
+    """
+    if not os.path.exists(REACTOME_GMT_PATH):
+        return None
+    return load_gene_set_library(REACTOME_GMT_PATH, REACTOME_LIBRARY)
+
+
+def benjamini_hochberg(p_values):
+    """
+    Returns the Benjamini-Hochberg adjusted p-values.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    m = len(p_values)
+    if m == 0:
+        return p_values
+    order = np.argsort(p_values)
+    ranked = p_values[order] * m / np.arange(1, m + 1)
+    adjusted = np.minimum.accumulate(ranked[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.clip(adjusted, 0, 1)
+    return result
+
+
+def enrich_gene_list(gene_list, library):
+    """
+    Over-representation analysis of a gene list against a loaded gene set library.
+    Background is the set of genes in the library. Returns the same columns as
+    gseapy.enrichr results (Term, Overlap, P-value, Adjusted P-value, Odds Ratio,
+    Combined Score, Genes...), sorted by p-value, for the terms with at least one overlapping gene.
+    """
+    from scipy.stats import hypergeom
+
+    gene_index = library["gene_index"]
+    query = sorted({str(g).strip().upper() for g in gene_list} & gene_index.keys())
+    columns = ["Gene_set", "Term", "Overlap", "P-value", "Adjusted P-value", "Old P-value",
+               "Old Adjusted P-value", "Odds Ratio", "Combined Score", "Genes"]
+    if not query:
+        return pd.DataFrame(columns=columns)
+
+    query_idx = np.fromiter((gene_index[g] for g in query), dtype=np.int64, count=len(query))
+    sub = library["matrix"][:, query_idx].tocsr()
+    sub.sort_indices()
+    overlap = np.diff(sub.indptr)
+    hit_terms = np.flatnonzero(overlap)
+
+    N = len(library["genes"])
+    n = len(query)
+    k = overlap[hit_terms]
+    K = library["sizes"][hit_terms]
+
+    p_values = hypergeom.sf(k - 1, N, K, n)
+
+    # Odds ratio of the 2x2 table, as computed by Enrichr
+    a = k.astype(float)
+    b = n - a
+    c = K - a
+    d = N - K - n + a
+    odds_ratio = (a * d) / np.maximum(b * c, 1)
+    combined_score = -np.log(np.maximum(p_values, np.finfo(float).tiny)) * odds_ratio
+
+    query_names = np.array(query, dtype=object)
+    overlap_genes = [
+        ";".join(query_names[sub.indices[sub.indptr[t]:sub.indptr[t + 1]]])
+        for t in hit_terms
+    ]
+
+    results = pd.DataFrame({
+        "Gene_set": library["name"],
+        "Term": library["terms"][hit_terms],
+        "Overlap": [f"{hits}/{size}" for hits, size in zip(k, K)],
+        "P-value": p_values,
+        "Adjusted P-value": benjamini_hochberg(p_values),
+        "Old P-value": 0,
+        "Old Adjusted P-value": 0,
+        "Odds Ratio": odds_ratio,
+        "Combined Score": combined_score,
+        "Genes": overlap_genes,
+    }, columns=columns)
+
+    return results.sort_values("P-value", kind="stable").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download an Enrichr gene set library for offline enrichment.")
+    parser.add_argument("--library", default=REACTOME_LIBRARY)
+    parser.add_argument("--out", default=None, help="GMT output path (default assets/genesets/<library>.gmt)")
+    args = parser.parse_args()
+    print(download_gene_set_library(args.library, args.out))
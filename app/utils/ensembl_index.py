@@ -0,0 +1,185 @@
+import argparse
+import csv
+import gzip
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+
+ENSEMBL_INDEX_PATH = os.environ.get(
+    "TRACTOME_ENSEMBL_INDEX",
+    str(Path(__file__).resolve().parents[2] / "assets" / "ensembl" / "ensembl_genes.sqlite")
+)
+
+# Keeps the number of bound parameters per statement below SQLite's limit
+SQLITE_CHUNK_SIZE = 500
+
+VERSIONED_ID = re.compile(r"^(ENS[A-Z]*G\d{11})\.(\d+)$")
+GTF_ATTRIBUTE = re.compile(r'(\w+) "([^"]*)"')
+
+# Column names accepted for each field in TSV dumps (Ensembl BioMart and HGNC exports)
+TSV_COLUMNS = {
+    "ensembl_id": ["Gene stable ID", "ensembl_gene_id", "gene_id"],
+    "display_name": ["Gene name", "symbol", "gene_name", "display_name"],
+    "biotype": ["Gene type", "locus_type", "gene_biotype", "biotype"],
+    "version": ["Version (gene)", "gene_version", "version"],
+}
+
+_local = threading.local()
+
+
+def strip_ensembl_version(ensembl_id):
+    """
+    Returns the stable id and version of an Ensembl gene id ("ENSG00000139618.12" -> ("ENSG00000139618", 12)).
+    The version is None for unversioned ids.
+    """
+    ensembl_id = str(ensembl_id).strip()
+    match = VERSIONED_ID.match(ensembl_id)
+    if match:
+        return match.group(1), int(match.group(2))
+    return ensembl_id, None
+
+
+def _open(path):
+    return gzip.open(path, "rt", encoding="utf-8") if str(path).endswith(".gz") else open(path, encoding="utf-8")
+
+
+def _read_gtf(path):
+    """
+    Yields (ensembl_id, display_name, biotype, version) for every gene line of an Ensembl or GENCODE GTF.
+    """
+    with _open(path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 9 or fields[2] != "gene":
+                continue
+            attributes = dict(GTF_ATTRIBUTE.findall(fields[8]))
+            ensembl_id, version = strip_ensembl_version(attributes.get("gene_id", ""))
+            if not ensembl_id:
+                continue
+            version = attributes.get("gene_version", version)
+            yield (
+                ensembl_id,
+                attributes.get("gene_name"),
+                attributes.get("gene_biotype") or attributes.get("gene_type"),
+                int(version) if version is not None else None
+            )
+
+
+def _read_tsv(path):
+    """
+    Yields (ensembl_id, display_name, biotype, version) for every row of a BioMart or HGNC TSV export.
+    """
+    with _open(path) as f:
+        reader = csv.DictReader(f, delimiter="\t")
+        columns = {
+            field: next((c for c in names if c in reader.fieldnames), None)
+            for field, names in TSV_COLUMNS.items()
+        }
+        if columns["ensembl_id"] is None:
+            raise ValueError(f"{path} has no Ensembl gene id column")
+        for row in reader:
+            ensembl_id, version = strip_ensembl_version(row[columns["ensembl_id"]])
+            if not ensembl_id:
+                continue
+            if columns["version"] and row[columns["version"]]:
+                version = int(row[columns["version"]])
+            yield (
+                ensembl_id,
+                (row[columns["display_name"]] or None) if columns["display_name"] else None,
+                (row[columns["biotype"]] or None) if columns["biotype"] else None,
+                version
+            )
+
+
+def build_ensembl_index(source_path, index_path=ENSEMBL_INDEX_PATH):
+    """
+    Builds the local ensembl_id -> display_name, biotype, version index from an Ensembl/GENCODE
+    GTF or a BioMart/HGNC TSV dump (optionally gzipped). Returns the number of indexed genes.
+    """
+    name = str(source_path).removesuffix(".gz")
+    # GFF3 attributes (key=value;) are not GTF's (key "value";), so .gff files are not read as GTF
+    rows = _read_gtf(source_path) if name.endswith(".gtf") else _read_tsv(source_path)
+
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("""
+        CREATE TABLE genes (
+            ensembl_id TEXT PRIMARY KEY,
+            display_name TEXT,
+            biotype TEXT,
+            version INTEGER
+        ) WITHOUT ROWID""")
+    conn.executemany("INSERT OR REPLACE INTO genes VALUES (?, ?, ?, ?)", rows)
+    conn.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT INTO metadata VALUES ('source', ?)", (os.path.basename(source_path),))
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM genes").fetchone()[0]
+    conn.close()
+    # Swap the finished file in, so running servers never read a half-built index
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def _connect():
+    """
+    Returns a read-only connection to the index for the current thread, or None if there is no index.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not os.path.exists(ENSEMBL_INDEX_PATH):
+            return None
+        conn = sqlite3.connect(f"file:{ENSEMBL_INDEX_PATH}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn = conn
+    return conn
+
+
+def lookup_ensembl_ids(ensembl_ids):
+    """
+    Looks up (possibly versioned) Ensembl gene ids in the local index.
+    Returns a dict mapping each input id found to {"display_name", "biotype", "version"}.
+    Ids missing from the index, or every id if there is no index, are left out.
+    """
+    try:
+        conn = _connect()
+    except sqlite3.Error:
+        return {}
+    if conn is None:
+        return {}
+
+    stable_ids = {}
+    for ensembl_id in ensembl_ids:
+        stable_ids.setdefault(strip_ensembl_version(ensembl_id)[0], []).append(ensembl_id)
+
+    found = {}
+    keys = list(stable_ids)
+    try:
+        for start in range(0, len(keys), SQLITE_CHUNK_SIZE):
+            chunk = keys[start:start + SQLITE_CHUNK_SIZE]
+            rows = conn.execute(
+                f"SELECT ensembl_id, display_name, biotype, version FROM genes "
+                f"WHERE ensembl_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for stable_id, display_name, biotype, version in rows:
+                for ensembl_id in stable_ids[stable_id]:
+                    found[ensembl_id] = {"display_name": display_name, "biotype": biotype, "version": version}
+    except sqlite3.Error:
+        return found
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local Ensembl gene id index.")
+    parser.add_argument("source", help="Ensembl/GENCODE GTF or BioMart/HGNC TSV dump (optionally .gz)")
+    parser.add_argument("--out", default=ENSEMBL_INDEX_PATH, help="SQLite index path")
+    args = parser.parse_args()
+    print(f"Indexed {build_ensembl_index(args.source, args.out)} genes into {args.out}")
@@ -0,0 +1,79 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Tables rendered to CSV at the same time while earlier ones are compressed into the archive
+EXPORT_WORKERS = int(os.environ.get("TRACTOME_EXPORT_WORKERS", 4))
+CSV_CHUNK_ROWS = 10000  # Rows converted to CSV text at a time
+SPOOL_MAX_SIZE = 8 * 1024 * 1024  # Bytes a temporary CSV or ZIP keeps in memory before moving to disk
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def write_csv(f, df):
+    """
+    Writes df as CSV to a text file, CSV_CHUNK_ROWS rows at a time, so the whole
+    table is never held as one string.
+    """
+    for start in range(0, max(len(df), 1), CSV_CHUNK_ROWS):
+        df.iloc[start:start + CSV_CHUNK_ROWS].to_csv(f, index=False, header=start == 0)
+
+
+def _render_csv(df):
+    """
+    Returns the CSV of df in a rewound spooled temporary file.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    write_csv(text, df)
+    text.flush()
+    text.detach()
+    spool.seek(0)
+    return spool
+
+
+def _rendered(tables, workers):
+    """
+    Yields the (name, CSV file) of each (name, df) of tables, in order, rendering
+    up to workers tables ahead of the one being consumed.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tractome-export") as executor:
+        pending = deque()
+        for name, df in tables:
+            pending.append((name, executor.submit(_render_csv, df)))
+            if len(pending) >= workers:
+                name, future = pending.popleft()
+                yield name, future.result()
+        while pending:
+            name, future = pending.popleft()
+            yield name, future.result()
+
+
+def write_zip(f, tables, extra_files=(), workers=EXPORT_WORKERS):
+    """
+    Writes an iterable of (filename, DataFrame) as CSVs into a ZIP archive; f is a path or a binary file.
+    Tables are rendered by worker threads while earlier ones are compressed, and streamed into the
+    archive, so only a few of them are in memory at a time. Existing extra_files are added as they are.
+    """
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, csv_file in _rendered(tables, max(1, workers)):
+            with csv_file, zf.open(name, "w", force_zip64=True) as member:
+                shutil.copyfileobj(csv_file, member, COPY_BUFFER_SIZE)
+        for path in extra_files:
+            if os.path.exists(path):
+                zf.write(path, arcname=os.path.basename(path))
+
+
+def zip_bytes(tables, extra_files=()):
+    """
+    Returns the ZIP archive of write_zip as bytes, for st.download_button. The archive is built
+    in a spooled temporary file, so its only copy in memory is the one returned.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        write_zip(spool, tables, extra_files)
+        spool.seek(0)
+        return spool.read()
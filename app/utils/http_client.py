@@ -0,0 +1,82 @@
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.concurrency import UPSTREAM_CONCURRENCY, DEFAULT_CONCURRENCY
+
+
+# Base URLs of the upstream APIs, can point to a mirror or to the benchmark mock servers
+UPSTREAM_URLS = {
+    "ensembl": os.environ.get("TRACTOME_ENSEMBL_URL", "https://rest.ensembl.org"),
+    "opentargets": os.environ.get("TRACTOME_OPENTARGETS_URL", "https://api.platform.opentargets.org/api/v4/graphql"),
+    "dgidb": os.environ.get("TRACTOME_DGIDB_URL", "https://dgidb.org/api/graphql"),
+}
+
+# (connect, read) timeouts in seconds, used when a call does not give its own
+DEFAULT_TIMEOUT = (
+    float(os.environ.get("TRACTOME_HTTP_CONNECT_TIMEOUT", 5)),
+    float(os.environ.get("TRACTOME_HTTP_READ_TIMEOUT", 60))
+)
+
+# Connections kept open per upstream on top of its concurrency limit, for the
+# single-id lookups and release checks made outside of the upstream thread pool
+EXTRA_CONNECTIONS = 2
+
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+    "User-Agent": "Tractome (https://github.com/ratolon/Tractome)",
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class _TimeoutAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies DEFAULT_TIMEOUT to requests sent without a timeout.
+    """
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = DEFAULT_TIMEOUT
+        return super().send(request, **kwargs)
+
+
+class _RejectCookies(DefaultCookiePolicy):
+    def set_ok(self, cookie, request):
+        return False
+
+
+def _create_session(upstream):
+    pool_size = UPSTREAM_CONCURRENCY.get(upstream, DEFAULT_CONCURRENCY) + EXTRA_CONNECTIONS
+    # Retries are handled by utils.ratelimit, which also knows about Retry-After
+    adapter = _TimeoutAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    # None of the upstream APIs use cookies; a shared cookie jar is the one part of a
+    # Session that is not safe to use from several threads at once
+    session.cookies.set_policy(_RejectCookies())
+    return session
+
+
+def get_session(upstream):
+    """
+    Returns the requests.Session shared by every call to an upstream API
+    ("ensembl", "opentargets", "dgidb"), so connections are reused across calls.
+    Sessions keep a pool of keep-alive connections sized to the upstream concurrency,
+    request gzip responses and time out after DEFAULT_TIMEOUT. They are shared by all
+    Streamlit sessions and worker threads of the process.
+    """
+    session = _sessions.get(upstream)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(upstream)
+            if session is None:
+                session = _create_session(upstream)
+                _sessions[upstream] = session
+    return session
@@ -0,0 +1,224 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+
+METRICS_DISABLED = os.environ.get("TRACTOME_METRICS_DISABLED", "") not in ("", "0")
+# Port of the Prometheus text endpoint (/metrics); not started when unset
+METRICS_PORT = os.environ.get("TRACTOME_METRICS_PORT")
+
+TIMING_COLUMNS = ["Stage", "Wall time (s)", "Requests", "Request time (s)", "Bytes",
+                  "Cache hits", "Cache misses", "Retries", "Errors"]
+
+# One JSON line per run on stderr, unless the logger is configured elsewhere
+logger = logging.getLogger("tractome.metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# (run, stage) of the current thread. Copied into the upstream thread pools by concurrency.fan_out
+_current = contextvars.ContextVar("tractome_run", default=(None, None))
+
+# Process-wide counters exported to Prometheus: (metric, labels) -> value
+_totals = {}
+_totals_lock = threading.Lock()
+_server = None
+_server_lock = threading.Lock()
+
+
+class Run:
+    """
+    Timings and upstream call counts of one analysis, per stage.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, **counts):
+        with self.lock:
+            row = self.stages.setdefault(stage, dict.fromkeys(TIMING_COLUMNS[1:], 0))
+            for column, value in counts.items():
+                row[column] += value
+
+    def table(self):
+        """
+        The per-stage timing table, one row per stage in the order they ran.
+        """
+        with self.lock:
+            rows = [{"Stage": stage, **counts} for stage, counts in self.stages.items()]
+        return pd.DataFrame(rows, columns=TIMING_COLUMNS)
+
+    def log(self):
+        """
+        Writes the timings of the run as one JSON log line.
+        """
+        with self.lock:
+            stages = {stage: dict(counts) for stage, counts in self.stages.items()}
+        logger.info(json.dumps({"event": "tractome_run", "run": self.name, "stages": stages}))
+
+
+def _count(metric, labels, value=1):
+    with _totals_lock:
+        _totals[(metric, labels)] = _totals.get((metric, labels), 0) + value
+
+
+def _add_to_stage(**counts):
+    run, stage = _current.get()
+    if run is not None and stage is not None:
+        run.add(stage, **counts)
+
+
+@contextmanager
+def track_run(name):
+    """
+    Collects the stages and upstream calls made inside the block into a Run, which is yielded.
+    The timings are logged as a JSON line when the block ends.
+    """
+    run = Run(name)
+    token = _current.set((run, None))
+    try:
+        yield run
+    finally:
+        _current.reset(token)
+        if not METRICS_DISABLED:
+            run.log()
+
+
+@contextmanager
+def track_stage(stage):
+    """
+    Times a pipeline stage. Upstream calls made inside the block are counted under it.
+    """
+    if METRICS_DISABLED:
+        yield
+        return
+    run, _ = _current.get()
+    token = _current.set((run, stage))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current.reset(token)
+        if run is not None:
+            run.add(stage, **{"Wall time (s)": elapsed})
+        _count("tractome_stage_seconds_total", (("stage", stage),), elapsed)
+        _count("tractome_stage_runs_total", (("stage", stage),))
+
+
+def record_request(upstream, seconds, nbytes=0, status="error"):
+    """
+    Records one request sent to an upstream API.
+    """
+    if METRICS_DISABLED:
+        return
+    _add_to_stage(**{"Requests": 1, "Request time (s)": seconds, "Bytes": nbytes})
+    _count("tractome_upstream_requests_total", (("upstream", upstream), ("status", str(status))))
+    _count("tractome_upstream_request_seconds_total", (("upstream", upstream),), seconds)
+    _count("tractome_upstream_response_bytes_total", (("upstream", upstream),), nbytes)
+
+
+@contextmanager
+def timed_request(upstream):
+    """
+    Records the block as one request to an upstream API, for clients not going through utils.ratelimit.
+    """
+    if METRICS_DISABLED:
+        yield
+        return
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        record_request(upstream, time.perf_counter() - start, status=status)
+
+
+def record_retry(upstream):
+    if METRICS_DISABLED:
+        return
+    _add_to_stage(Retries=1)
+    _count("tractome_upstream_retries_total", (("upstream", upstream),))
+
+
+def record_error(upstream):
+    """
+    Records a request that failed for good (retries exhausted or circuit open).
+    """
+    if METRICS_DISABLED:
+        return
+    _add_to_stage(Errors=1)
+    _count("tractome_upstream_errors_total", (("upstream", upstream),))
+
+
+def record_cache(source, hits, misses):
+    if METRICS_DISABLED:
+        return
+    _add_to_stage(**{"Cache hits": hits, "Cache misses": misses})
+    _count("tractome_cache_hits_total", (("source", source),), hits)
+    _count("tractome_cache_misses_total", (("source", source),), misses)
+
+
+def render_prometheus():
+    """
+    Process-wide counters in the Prometheus text exposition format.
+    """
+    with _totals_lock:
+        totals = sorted(_totals.items())
+    lines = []
+    typed = set()
+    for (metric, labels), value in totals:
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        label_text = ",".join(f'{name}="{value_}"' for name, value_ in labels)
+        lines.append(f"{metric}{{{label_text}}} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT):
+    """
+    Serves render_prometheus() on http://0.0.0.0:<port>/metrics from a daemon thread.
+    Does nothing if no port is configured, metrics are disabled or the server already runs.
+    """
+    global _server
+    if not port or METRICS_DISABLED or _server is not None:
+        return
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+            _server = False
+            return
+        threading.Thread(target=_server.serve_forever, name="tractome-metrics", daemon=True).start()
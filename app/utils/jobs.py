@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+
+JOBS_PATH = os.environ.get(
+    "TRACTOME_JOBS_PATH",
+    str(Path.home() / ".cache" / "tractome" / "jobs.sqlite")
+)
+JOBS_DIR = os.environ.get("TRACTOME_JOBS_DIR", str(Path(JOBS_PATH).parent / "jobs"))
+JOB_WORKERS = int(os.environ.get("TRACTOME_JOB_WORKERS", 2))
+JOB_TTL = int(os.environ.get("TRACTOME_JOB_TTL", 7 * 24 * 3600))  # Seconds a finished job is kept
+JOB_HEARTBEAT_INTERVAL = 10.0  # Seconds between updates of updated_at of the jobs a process runs
+# Seconds without an update after which a queued or running job is considered lost with its server process
+JOB_HEARTBEAT_TIMEOUT = float(os.environ.get("TRACTOME_JOB_HEARTBEAT_TIMEOUT", 60))
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+# Queued and running jobs of this process, kept alive by its heartbeat
+_active = set()
+_active_lock = threading.Lock()
+
+
+def _connect():
+    """
+    Returns the job table connection of the current thread, creating the database if needed.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(JOBS_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(JOBS_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                stages TEXT NOT NULL,
+                completed TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                error TEXT,
+                pid INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (key)")
+        _local.conn = conn
+    return conn
+
+
+def _heartbeat():
+    """
+    Refreshes updated_at of the jobs of this process every JOB_HEARTBEAT_INTERVAL, so the
+    other server processes sharing the job table know they are still running.
+    """
+    while True:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        with _active_lock:
+            job_ids = list(_active)
+        try:
+            _connect().executemany(
+                "UPDATE jobs SET updated_at = ? WHERE job_id = ? AND status IN ('queued', 'running')",
+                [(time.time(), job_id) for job_id in job_ids]
+            )
+        except sqlite3.Error:
+            pass
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="tractome-job")
+                threading.Thread(target=_heartbeat, name="tractome-job-heartbeat", daemon=True).start()
+    return _executor
+
+
+def _is_lost(job):
+    """
+    Whether a queued or running job has stopped with its server process: it is not run by this
+    process and no heartbeat has updated it for JOB_HEARTBEAT_TIMEOUT seconds.
+    """
+    if job["status"] not in ("queued", "running"):
+        return False
+    with _active_lock:
+        if job["job_id"] in _active:
+            return False
+    return time.time() - job["updated_at"] > JOB_HEARTBEAT_TIMEOUT
+
+
+def _job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _row_to_job(row):
+    job_id, key, status, stage, stages, completed, metadata, error, pid, created_at, updated_at = row
+    stages, completed = json.loads(stages), json.loads(completed)
+    return {
+        "job_id": job_id,
+        "key": key,
+        "status": status,
+        "stage": stage,
+        "stages": stages,
+        "completed": completed,
+        "progress": len(completed) / len(stages) if stages else 1.0,
+        "metadata": json.loads(metadata),
+        "error": error,
+        "pid": pid,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+def get_job(job_id):
+    """
+    Returns the job as a dict (status, current stage, completed stages, progress...), or None.
+    """
+    row = _connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = _row_to_job(row)
+    if _is_lost(job):
+        _update_job(job_id, status="failed", error="Interrupted by a server restart, upload the file again")
+        return get_job(job_id)
+    return job
+
+
+def _update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _connect().execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+
+def _cleanup():
+    """
+    Deletes finished jobs older than JOB_TTL together with their artifacts.
+    """
+    conn = _connect()
+    expired = [row[0] for row in conn.execute(
+        "SELECT job_id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+        (time.time() - JOB_TTL,)
+    )]
+    for job_id in expired:
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+
+def artifact_path(job_id, name):
+    """
+    Path of a file artifact of a job, written by a callable passed to save_artifact.
+    """
+    return os.path.join(_job_dir(job_id), name)
+
+
+def save_artifact(job_id, name, df):
+    """
+    Stores a stage result of a job. Written to a temporary file first, so readers never see half a file.
+    If df is a callable, it is called with that temporary path to write the file itself (e.g. a ZIP
+    archive), which is then found at artifact_path(job_id, name).
+    """
+    os.makedirs(_job_dir(job_id), exist_ok=True)
+    if callable(df):
+        path = artifact_path(job_id, name)
+        df(f"{path}.tmp")
+    else:
+        path = artifact_path(job_id, f"{name}.pkl")
+        pd.to_pickle(df, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def load_artifact(job_id, name):
+    """
+    Returns a stage result of a job, or None if the stage has not finished.
+    """
+    path = artifact_path(job_id, f"{name}.pkl")
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+
+def _run(job_id, func, args):
+    """
+    Runs a job in a worker thread. func(report, *args) must call report(stage, result) as each
+    stage finishes, which stores the result and marks the stage as completed. Results reported
+    under names that are not stages of the job (e.g. timings) are stored without marking anything.
+    """
+    completed = []
+    stages = get_job(job_id)["stages"]
+
+    def report(stage, result):
+        save_artifact(job_id, stage, result)
+        if stage in stages:
+            completed.append(stage)
+            _update_job(job_id, completed=json.dumps(completed), stage=stage)
+
+    _update_job(job_id, status="running")
+    try:
+        func(report, *args)
+        _update_job(job_id, status="done", stage=None)
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e) or traceback.format_exc(limit=1))
+    finally:
+        with _active_lock:
+            _active.discard(job_id)
+
+
+def submit_job(key, stages, func, *args, metadata=None, retry=False):
+    """
+    Submits func(report, *args) to the local worker pool and returns its job id.
+    The id of the latest job with the same key is returned instead, so a refresh or a second
+    tab (of any server process) reattaches to it. A failed job is only started again when retry
+    is set, so reruns do not resubmit a failing job. Jobs lost with their server process are
+    started again.
+    """
+    conn = _connect()
+    _cleanup()
+
+    # Check and insert in one write transaction, so two tabs submitting together share a job
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE key = ? ORDER BY created_at DESC LIMIT 1", (key,)
+        ).fetchone()
+        if row is not None:
+            job = _row_to_job(row)
+            if _is_lost(job):
+                _update_job(job["job_id"], status="failed", error="Interrupted by a server restart, upload the file again")
+            elif job["status"] != "failed" or not retry:
+                conn.execute("COMMIT")
+                return job["job_id"]
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs VALUES (?, ?, 'queued', NULL, ?, '[]', ?, NULL, ?, ?, ?)",
+            (job_id, key, json.dumps(list(stages)), json.dumps(metadata or {}), os.getpid(), now, now)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    with _active_lock:
+        _active.add(job_id)
+    _get_executor().submit(_run, job_id, func, args)
+    return job_id
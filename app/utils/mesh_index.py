@@ -0,0 +1,177 @@
+import argparse
+import gzip
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+
+MESH_INDEX_PATH = os.environ.get(
+    "TRACTOME_MESH_INDEX",
+    str(Path(__file__).resolve().parents[2] / "assets" / "mesh" / "mesh_descriptors.sqlite")
+)
+
+DESCRIPTOR_UI = re.compile(r"^D\d{6,9}$")
+
+_local = threading.local()
+
+
+def normalize_disease_name(name: str) -> str:
+    """
+    Normalizes the disease name to match those in Expression Atlas
+    """
+    # If there's a comma, move the part after the comma to the front
+    if "," in name:
+        parts = [part.strip() for part in name.split(",")]
+        # e.g., ["Muscular Dystrophy", "Duchenne"] → "Duchenne Muscular Dystrophy"
+        return f"{parts[1]} {parts[0]}"
+    return name
+
+
+def mesh_url(descriptor_ui):
+    """
+    NCBI MeSH page of a descriptor. Its Entrez uid is the descriptor number prefixed with 68 (D003110 -> 68003110).
+    """
+    return f"https://www.ncbi.nlm.nih.gov/mesh/68{descriptor_ui[1:]}"
+
+
+def _open(path):
+    return gzip.open(path, "rt", encoding="utf-8") if str(path).endswith(".gz") else open(path, encoding="utf-8")
+
+
+def _read_xml(path):
+    """
+    Yields (descriptor_ui, preferred term, entry terms) for every record of an NLM MeSH descriptor XML (desc<year>.xml).
+    """
+    with _open(path) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != "DescriptorRecord":
+                continue
+            terms = [term.text for term in elem.iterfind("ConceptList/Concept/TermList/Term/String") if term.text]
+            yield elem.findtext("DescriptorUI"), elem.findtext("DescriptorName/String"), terms
+            elem.clear()
+
+
+def _read_ascii(path):
+    """
+    Yields (descriptor_ui, preferred term, entry terms) for every record of an NLM MeSH ASCII descriptor file (d<year>.bin).
+    """
+    record = None
+    with _open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line == "*NEWRECORD":
+                if record and record["ui"]:
+                    yield record["ui"], record["name"], record["terms"]
+                record = {"ui": None, "name": None, "terms": []}
+                continue
+            if record is None or " = " not in line:
+                continue
+            field, value = line.split(" = ", 1)
+            if field == "UI":
+                record["ui"] = value
+            elif field == "MH":
+                record["name"] = value
+            elif field in ("ENTRY", "PRINT ENTRY"):
+                # Entry terms carry their attributes after a |
+                record["terms"].append(value.split("|", 1)[0])
+    if record and record["ui"]:
+        yield record["ui"], record["name"], record["terms"]
+
+
+def build_mesh_index(source_path, index_path=MESH_INDEX_PATH):
+    """
+    Builds the local descriptor UI -> preferred term, normalized name and entry terms index from an
+    NLM MeSH descriptor XML or ASCII dump (optionally gzipped). Returns the number of indexed descriptors.
+    """
+    name = str(source_path).removesuffix(".gz")
+    records = _read_xml(source_path) if name.endswith(".xml") else _read_ascii(source_path)
+
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("""
+        CREATE TABLE descriptors (
+            descriptor_ui TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            normalized_name TEXT NOT NULL
+        ) WITHOUT ROWID""")
+    conn.execute("""
+        CREATE TABLE terms (
+            term TEXT NOT NULL COLLATE NOCASE,
+            descriptor_ui TEXT NOT NULL,
+            PRIMARY KEY (term, descriptor_ui)
+        ) WITHOUT ROWID""")
+    for descriptor_ui, descriptor_name, terms in records:
+        if not descriptor_ui or not descriptor_name:
+            continue
+        conn.execute("INSERT OR REPLACE INTO descriptors VALUES (?, ?, ?)",
+                     (descriptor_ui, descriptor_name, normalize_disease_name(descriptor_name)))
+        conn.executemany("INSERT OR IGNORE INTO terms VALUES (?, ?)",
+                         [(term, descriptor_ui) for term in dict.fromkeys([descriptor_name, *terms])])
+    conn.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT INTO metadata VALUES ('source', ?)", (os.path.basename(source_path),))
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM descriptors").fetchone()[0]
+    conn.close()
+    # Swap the finished file in, so running servers never read a half-built index
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def _connect():
+    """
+    Returns a read-only connection to the index for the current thread, or None if there is no index.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not os.path.exists(MESH_INDEX_PATH):
+            return None
+        conn = sqlite3.connect(f"file:{MESH_INDEX_PATH}?mode=ro", uri=True, check_same_thread=False)
+        _local.conn = conn
+    return conn
+
+
+def lookup_mesh_descriptor(query):
+    """
+    Looks up a MeSH descriptor by its UI (e.g. D003110) or, failing that, by one of its
+    entry terms (case insensitive) in the local index.
+    Returns {"descriptor_ui", "name", "normalized_name", "url"}, or None if it is not
+    found or there is no index.
+    """
+    query = str(query).strip()
+    try:
+        conn = _connect()
+        if conn is None or not query:
+            return None
+        if DESCRIPTOR_UI.match(query.upper()):
+            row = conn.execute(
+                "SELECT descriptor_ui, name, normalized_name FROM descriptors WHERE descriptor_ui = ?",
+                (query.upper(),)
+            ).fetchone()
+        else:
+            # Descriptors whose preferred term is the query come first
+            row = conn.execute(
+                "SELECT d.descriptor_ui, d.name, d.normalized_name FROM terms t "
+                "JOIN descriptors d ON d.descriptor_ui = t.descriptor_ui "
+                "WHERE t.term = ? ORDER BY d.name = t.term DESC, d.descriptor_ui LIMIT 1",
+                (query,)
+            ).fetchone()
+    except sqlite3.Error:
+        return None
+    if row is None:
+        return None
+    descriptor_ui, name, normalized_name = row
+    return {"descriptor_ui": descriptor_ui, "name": name, "normalized_name": normalized_name, "url": mesh_url(descriptor_ui)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local MeSH descriptor index.")
+    parser.add_argument("source", help="NLM MeSH descriptor XML (desc<year>.xml) or ASCII (d<year>.bin) file, optionally .gz")
+    parser.add_argument("--out", default=MESH_INDEX_PATH, help="SQLite index path")
+    args = parser.parse_args()
+    print(f"Indexed {build_mesh_index(args.source, args.out)} descriptors into {args.out}")
@@ -1,40 +1,87 @@
-import streamlit as st
 import pandas as pd
-import requests
-import gseapy as gp
-from Bio import Entrez
-import urllib.parse
 import os
-import urllib.parse
-import gseapy as gp
-import re
-import io, zipfile
 import re
+import zipfile
 import urllib.parse
+from utils.cache import cache_get, cache_set, cache_get_many, cache_set_many
+from utils.concurrency import fan_out
+from utils.http_client import UPSTREAM_URLS
+from utils.ratelimit import request, UpstreamError
+from utils.instrumentation import timed_request
+from utils.enrichment import load_reactome_library, enrich_gene_list
+from utils.ensembl_index import lookup_ensembl_ids, strip_ensembl_version
+from utils.mesh_index import lookup_mesh_descriptor, normalize_disease_name
+
+
+GRAPHQL_URL = UPSTREAM_URLS["dgidb"]
+DGIDB_BATCH_SIZE = 100  # Gene names per DGIdb GraphQL request
+OPEN_TARGETS_URL = UPSTREAM_URLS["opentargets"]
+OPEN_TARGETS_BATCH_SIZE = 200  # Ensembl ids per Open Targets targets() request
+ENSEMBL_LOOKUP_URL = f"{UPSTREAM_URLS['ensembl']}/lookup/id/"
+ENSEMBL_BATCH_LOOKUP_URL = f"{UPSTREAM_URLS['ensembl']}/lookup/id"
+ENSEMBL_BATCH_SIZE = 1000  # Maximum number of ids accepted by POST /lookup/id
+
+_MISSING = object()  # Cache sentinel, as None is a valid cached result
+
+class EnsemblRateLimitError(UpstreamError):
+    """
+    Raised when the Ensembl REST API keeps answering 429 (rate limit exceeded) after every retry.
+    """
 
+def _ensembl_request(method, url, **kwargs):
+    """
+    Ensembl request through the shared retry layer, raising EnsemblRateLimitError when throttled for too long.
+    """
+    try:
+        return request("ensembl", method, url, **kwargs)
+    except UpstreamError as e:
+        if e.status_code == 429:
+            raise EnsemblRateLimitError(str(e), e.upstream, e.status_code) from e
+        raise
 
-GRAPHQL_URL = "https://dgidb.org/api/graphql"
-ENSEMBL_LOOKUP_URL = "https://rest.ensembl.org/lookup/id/"
+def _chunks(items, size):
+    """
+    Splits a list into consecutive chunks of at most size elements.
+    """
+    return [items[start:start + size] for start in range(0, len(items), size)]
 
 # Methods
 def get_disease_name(mesh_id):
     """
-    Returns the corresponding name of a disease given a MESH id provided by the user. 
+    Returns the name of a disease given a MESH id provided by the user, normalized as in
+    Expression Atlas (see normalize_disease_name), and its MeSH page, or None.
+    The local MeSH index, which stores normalized names, is used first; Entrez is only queried
+    for descriptors missing from it, and its normalized answers are cached.
     """
+    descriptor = lookup_mesh_descriptor(mesh_id)
+    if descriptor is not None:
+        return descriptor["normalized_name"], descriptor["url"]
+
+    cached = cache_get("mesh", mesh_id)
+    if cached is not None:
+        # Entries cached before names were normalized hold the MeSH name
+        return normalize_disease_name(cached[0]), cached[1]
+
+    from Bio import Entrez
+
     try:
-        search_handle = Entrez.esearch(db="mesh", term=mesh_id)
-        search_record = Entrez.read(search_handle)
-        search_handle.close()
+        with timed_request("entrez"):
+            search_handle = Entrez.esearch(db="mesh", term=mesh_id)
+            search_record = Entrez.read(search_handle)
+            search_handle.close()
         if not search_record['IdList']:
             return None
         uid = search_record['IdList'][0]
-        summary_handle = Entrez.esummary(db="mesh", id=uid)
-        summary_record = Entrez.read(summary_handle)
-        summary_handle.close()
+        with timed_request("entrez"):
+            summary_handle = Entrez.esummary(db="mesh", id=uid)
+            summary_record = Entrez.read(summary_handle)
+            summary_handle.close()
         disease_url = f"https://www.ncbi.nlm.nih.gov/mesh/{uid}"
-        return summary_record[0]['DS_MeshTerms'][0], disease_url
+        disease = normalize_disease_name(str(summary_record[0]['DS_MeshTerms'][0])), disease_url
     except:
         return None
+    cache_set("mesh", mesh_id, disease)
+    return disease
     
 def generate_expression_atlas_link(disease_name):
     """
@@ -55,41 +102,170 @@ def get_gene_name_from_ensembl(ensembl_id):
     """
     Given an ensembl id it extracts the corresponding gene name.
     """
-    response = requests.get(f"{ENSEMBL_LOOKUP_URL}{ensembl_id}?content-type=application/json")
+    indexed = lookup_ensembl_ids([ensembl_id])
+    if ensembl_id in indexed:
+        return indexed[ensembl_id]["display_name"] or "Not Found"
+
+    ensembl_id = strip_ensembl_version(ensembl_id)[0]
+    cached = cache_get("ensembl", ensembl_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    response = _ensembl_request("GET", f"{ENSEMBL_LOOKUP_URL}{ensembl_id}?content-type=application/json")
     if response.status_code == 200:
         data = response.json()
-        return data.get("display_name", "Not Found")
-    elif response.status_code == 429:
-        st.warning("Error 429: Resource Exceeded. Please try again later.")
-        st.stop()
+        gene_name = data.get("display_name", "Not Found")
+        cache_set("ensembl", ensembl_id, gene_name)
+        return gene_name
     return "Not Found"
 
-def fetch_gene_names(df):
+def _lookup_ensembl_chunk(chunk):
+    """
+    Resolves one chunk of ensembl ids through POST /lookup/id.
+    Returns the response status code and a dict mapping each id to its gene name,
+    empty if the request failed.
+    """
+    response = _ensembl_request(
+        "POST",
+        ENSEMBL_BATCH_LOOKUP_URL,
+        headers={"Content-Type": "application/json", "Accept": "application/json"},
+        json={"ids": chunk}
+    )
+    if response.status_code != 200:
+        return response.status_code, {}
+
+    data = response.json()
+    resolved = {}
+    for ensembl_id in chunk:
+        # Unknown ids come back as null
+        record = data.get(ensembl_id) or {}
+        resolved[ensembl_id] = record.get("display_name") or "Not Found"
+    return response.status_code, resolved
+
+def get_gene_names_from_ensembl(ensembl_ids, failed=None):
+    """
+    Given a list of ensembl ids it extracts the corresponding gene names in batches.
+    Ids are resolved against the local Ensembl index first and through the REST API only
+    when missing from it. Versioned ids (e.g. ENSG00000139618.12) are accepted.
+    Returns a dict mapping every unique id to its gene name ("Not Found" if unknown).
+    Ids whose request failed are left out; if a list is given as failed, they are appended to it.
+    """
+    unique_ids = list(dict.fromkeys(ensembl_ids))
+    gene_names = {
+        ensembl_id: record["display_name"] or "Not Found"
+        for ensembl_id, record in lookup_ensembl_ids(unique_ids).items()
+    }
+
+    # The REST API and the cache only know unversioned ids
+    ids_by_stable_id = {}
+    for ensembl_id in unique_ids:
+        if ensembl_id not in gene_names:
+            ids_by_stable_id.setdefault(strip_ensembl_version(ensembl_id)[0], []).append(ensembl_id)
+
+    resolved = cache_get_many("ensembl", ids_by_stable_id)
+    missing_ids = [stable_id for stable_id in ids_by_stable_id if stable_id not in resolved]
+
+    for status_code, chunk_names in fan_out("ensembl", _lookup_ensembl_chunk, _chunks(missing_ids, ENSEMBL_BATCH_SIZE)):
+        if status_code == 200:
+            cache_set_many("ensembl", chunk_names)
+        resolved.update(chunk_names)
+
+    for stable_id, gene_name in resolved.items():
+        for ensembl_id in ids_by_stable_id[stable_id]:
+            gene_names[ensembl_id] = gene_name
+    if failed is not None:
+        # Answered chunks resolve every id, even unknown ones
+        failed.extend(
+            ensembl_id for stable_id in missing_ids if stable_id not in resolved
+            for ensembl_id in ids_by_stable_id[stable_id]
+        )
+
+    return gene_names
+
+def _optional_float(name):
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+# Columns of an Expression Atlas differential expression TSV used by the pipeline, with their dtypes.
+# The fold change stays float64, as it is summed per gene and shown in every table.
+EXPRESSION_COLUMNS = {"Gene": "str", "log_2 fold change": "float64", "Adjusted p-value": "float32"}
+EXPRESSION_CHUNK_ROWS = 100000
+# Rows kept by read_expression_tsv: fold change above / adjusted p-value at most (unset keeps every row)
+EXPRESSION_MIN_LOG2FC = _optional_float("TRACTOME_MIN_LOG2FC")
+EXPRESSION_MAX_PVALUE = _optional_float("TRACTOME_MAX_PVALUE")
+
+def read_expression_tsv(source, min_log2fc=EXPRESSION_MIN_LOG2FC, max_pvalue=EXPRESSION_MAX_PVALUE,
+                        chunksize=EXPRESSION_CHUNK_ROWS):
+    """
+    Reads an Expression Atlas differential expression TSV (path or file object) in chunks of rows,
+    parsing only the gene id, fold change and adjusted p-value columns. Rows with a fold change not
+    above min_log2fc or an adjusted p-value above max_pvalue are dropped as the chunks stream, and
+    fold changes are summed per gene, so only one row per gene is ever held.
+    Returns a (Gene, log_2 fold change) table with one row per gene id, in order of appearance.
+    """
+    partials = []
+    with pd.read_csv(source, sep="\t", usecols=lambda column: column in EXPRESSION_COLUMNS,
+                     dtype=EXPRESSION_COLUMNS, chunksize=chunksize) as reader:
+        for chunk in reader:
+            missing = {"Gene", "log_2 fold change"}.difference(chunk.columns)
+            if missing:
+                raise ValueError(f"Not an Expression Atlas differential expression file, missing {', '.join(sorted(missing))}")
+            chunk = chunk.dropna(subset=["Gene"])
+            if min_log2fc is not None:
+                chunk = chunk[chunk["log_2 fold change"] > min_log2fc]
+            if max_pvalue is not None and "Adjusted p-value" in chunk.columns:
+                chunk = chunk[chunk["Adjusted p-value"] <= max_pvalue]
+            partials.append(chunk.groupby("Gene", sort=False)["log_2 fold change"].sum())
+
+    if not partials:
+        return pd.DataFrame({"Gene": pd.Series(dtype="str"), "log_2 fold change": pd.Series(dtype="float64")})
+    summed = pd.concat(partials).groupby(level=0, sort=False).sum()
+    return summed.rename_axis("Gene").reset_index()
+
+# Column of the gene table holding the normalized gene name, the key genes are matched on
+# across Reactome, DGIdb and the summary table
+GENE_KEY = "Gene Key"
+
+def normalize_gene_names(names):
+    """
+    Stripped, upper-cased gene names as a categorical Series.
+    """
+    return names.astype(str).str.strip().str.upper().astype("category")
+
+def gene_keys(df):
+    """
+    Normalized gene names of a gene table: its GENE_KEY column, computed once by fetch_gene_names.
+    """
+    if GENE_KEY in df.columns:
+        return df[GENE_KEY]
+    return normalize_gene_names(df["Gene Name"])
+
+def fetch_gene_names(df, failed=None):
     """
     Fetches gene names from ensembl and groups them according to log_2 fold change.
+    Returns the gene table used by the rest of the pipeline: Gene, Gene Name (categorical),
+    log_2 fold change and GENE_KEY, the categorical normalized gene name. Display code drops GENE_KEY.
+    Genes whose Ensembl request failed are left out, and appended to failed if a list is given.
     """
 
-    df["Gene Name"] = df["Gene"].apply(get_gene_name_from_ensembl)
-    df_filtered = df[df["Gene Name"] != "Not Found"]
+    gene_names = get_gene_names_from_ensembl(df["Gene"].dropna().tolist(), failed)
+    names = df["Gene"].map(gene_names)
+    found = names.notna() & (names != "Not Found")
 
     # Sum log2 fold changes for repeated genes
-    grouped = df_filtered.groupby(["Gene", "Gene Name"], as_index=False).agg({
-        "log_2 fold change": "sum"
-    })
+    grouped = (
+        df.loc[found, ["Gene", "log_2 fold change"]]
+        .assign(**{"Gene Name": names[found]})
+        .groupby(["Gene", "Gene Name"], as_index=False)["log_2 fold change"].sum()
+    )
+    grouped["Gene Name"] = grouped["Gene Name"].astype("category")
+    grouped[GENE_KEY] = normalize_gene_names(grouped["Gene Name"])
 
     return grouped
 
 
-def find_possible_target_of_drugs(ensembl_id):
-    """
-    Given an Ensembl Gene ID, it asks the OpenTragetS API to check if it's a drug target.
-    Returns the gene symbol, whether it's a known drug target, and associated approved drugs.
-    """
-    
-    #query string to get general information about AR and genetic constraint and tractability assessments 
-    query_string = """
-      query target($ensemblId: String!){
-        target(ensemblId: $ensemblId){
+# Fields requested for every target: general information, genetic constraint and tractability assessments
+OPEN_TARGETS_TARGET_FIELDS = """
           id
           approvedSymbol
           biotype
@@ -106,48 +282,132 @@ def find_possible_target_of_drugs(ensembl_id):
             label
             modality
             value
-          }
+          }"""
+
+def parse_open_targets_target(data):
+    """
+    Builds the tractability record of a target returned by the Open Targets API.
+    "Genetic Constraint" maps each constraint type (syn, mis, lof) to its observed/expected metrics.
+    """
+    return {
+        "Gene Symbol": data.get("approvedSymbol", ""),
+        "Ensembl ID": data.get("id", ""),
+        "Name": data.get("approvedName", ""),
+        "Biotype": data.get("biotype", ""),
+        "Tractability": [
+            t["label"] for t in data.get("tractability") or [] if t["value"]
+        ],
+        "Genetic Constraint": {
+            c["constraintType"]: {k: v for k, v in c.items() if k != "constraintType"}
+            for c in data.get("geneticConstraint") or []
         }
-      }"""
+    }
+
+def find_possible_target_of_drugs(ensembl_id):
+    """
+    Given an Ensembl Gene ID, it asks the OpenTragetS API to check if it's a drug target.
+    Returns the gene symbol, whether it's a known drug target, and associated approved drugs.
+    """
+    
+    #query string to get general information about AR and genetic constraint and tractability assessments 
+    query_string = f"""
+      query target($ensemblId: String!){{
+        target(ensemblId: $ensemblId){{{OPEN_TARGETS_TARGET_FIELDS}
+        }}
+      }}"""
+
+    cached = cache_get("opentargets", ensembl_id, _MISSING)
+    if cached is not _MISSING:
+        return cached
 
     # Set variables object of arguments to be passed to endpoint
     variables = {"ensemblId": ensembl_id}
 
-    # Set base URL of GraphQL API endpoint
-    base_url = "https://api.platform.opentargets.org/api/v4/graphql"
-
     # Perform POST request and check status code of response
     try:
-        r = requests.post(base_url, json={"query": query_string, "variables": variables})
+        r = request("opentargets", "POST", OPEN_TARGETS_URL, json={"query": query_string, "variables": variables})
         if r.status_code != 200:
             return None
         data = r.json()['data']['target']
-        return {
-            "Gene Symbol": data.get("approvedSymbol", ""),
-            "Ensembl ID": data.get("id", ""),
-            "Name": data.get("approvedName", ""),
-            "Biotype": data.get("biotype", ""),
-            "Tractability": [
-                t["label"] for t in data.get("tractability", []) if t["value"]
-            ]
-        }
+        record = parse_open_targets_target(data)
+        cache_set("opentargets", ensembl_id, record)
+        return record
     except:
         return None
 
+OPEN_TARGETS_TARGETS_QUERY = f"""
+      query targets($ensemblIds: [String!]!){{
+        targets(ensemblIds: $ensemblIds){{{OPEN_TARGETS_TARGET_FIELDS}
+        }}
+      }}"""
+
+def _query_open_targets_chunk(chunk):
+    """
+    Queries the Open Targets targets() field for one chunk of Ensembl Gene IDs.
+    Returns a dict mapping each id to its record, or None if the request failed.
+    """
+    try:
+        r = request(
+            "opentargets", "POST", OPEN_TARGETS_URL,
+            json={"query": OPEN_TARGETS_TARGETS_QUERY, "variables": {"ensemblIds": chunk}}
+        )
+        if r.status_code != 200:
+            return None
+        targets = r.json()['data']['targets'] or []
+    except:
+        return None
+
+    # Ids missing from the response are not Open Targets targets
+    chunk_records = {ensembl_id: None for ensembl_id in chunk}
+    for data in targets:
+        if data.get("id") in chunk_records:
+            chunk_records[data["id"]] = parse_open_targets_target(data)
+    return chunk_records
+
+def find_possible_targets_of_drugs(ensembl_ids, failed=None):
+    """
+    Batch version of find_possible_target_of_drugs. Queries the Open Targets API for
+    chunks of OPEN_TARGETS_BATCH_SIZE unique Ensembl Gene IDs at a time.
+    Returns one record per input id, in the same order (None if the id is not a known target).
+    If a list is given as failed, the ids whose request failed are appended to it.
+    """
+    unique_ids = list(dict.fromkeys(ensembl_ids))
+    records = cache_get_many("opentargets", unique_ids)
+    missing_ids = [ensembl_id for ensembl_id in unique_ids if ensembl_id not in records]
+
+    for chunk_records in fan_out("opentargets", _query_open_targets_chunk, _chunks(missing_ids, OPEN_TARGETS_BATCH_SIZE)):
+        if chunk_records is not None:
+            cache_set_many("opentargets", chunk_records)
+            records.update(chunk_records)
+
+    if failed is not None:
+        failed.extend(ensembl_id for ensembl_id in missing_ids if ensembl_id not in records)
+
+    return [records.get(ensembl_id) for ensembl_id in ensembl_ids]
+
 
 def analyze_pathways(df, number):
     """
     Analyzes n (given number) pathways in which the the genes interact.
+    Every enriched pathway is returned when number is None.
     """
     # Prepare gene list
-    df_genes = df["Gene Name"].dropna().astype(str).str.strip().str.upper().unique().tolist()
-
-    # Enrichment
-    enr = gp.enrichr(gene_list=df_genes, gene_sets="Reactome_2022", organism="Human", outdir=None)
-    if enr.results.empty:
+    keys = gene_keys(df)
+    df_genes = keys.dropna().unique().tolist()
+
+    # Enrichment, offline when the Reactome library has been downloaded and through Enrichr otherwise
+    library = load_reactome_library()
+    if library is not None:
+        results = enrich_gene_list(df_genes, library)
+    else:
+        import gseapy as gp
+
+        with timed_request("enrichr"):
+            results = gp.enrichr(gene_list=df_genes, gene_sets="Reactome_2022", organism="Human", outdir=None).results
+    if results.empty:
         return None, None
 
-    top_pathways = enr.results.copy()
+    top_pathways = results
 
     # Extract Reactome ID and create direct link
     def make_reactome_link(term):
@@ -163,40 +423,145 @@ def analyze_pathways(df, number):
     # Parse overlap info
     top_pathways[["Input Genes", "Pathway Genes"]] = top_pathways["Overlap"].str.split("/", expand=True).astype(int)
     top_pathways["Input %"] = top_pathways["Input Genes"] / top_pathways["Pathway Genes"] * 100
-    top_pathways = top_pathways.sort_values("Adjusted P-value", ascending=True).head(number)
+    top_pathways = top_pathways.sort_values("Adjusted P-value", ascending=True)
+    if number is not None:
+        top_pathways = top_pathways.head(number)
 
-    # Sum log2fc for overlapping genes per pathway
-    df["Gene Name"] = df["Gene Name"].astype(str).str.strip().str.upper()
-    sum_fc = []
-    for _, row in top_pathways.iterrows():
-        genes = [g.strip().upper() for g in row["Genes"].split(";")]
-        overlap_df = df[df["Gene Name"].isin(genes)]
-        sum_fc.append(overlap_df["log_2 fold change"].sum())
+    # Sum log2fc for overlapping genes per pathway, joining every (pathway, gene) pair once
+    fc_per_gene = df["log_2 fold change"].groupby(keys, observed=True).sum()
+    pathway_fc = explode_pathway_genes(top_pathways)
+    sum_fc = pathway_fc["Gene Name"].map(fc_per_gene).groupby(pathway_fc["Term"]).sum()
 
-    top_pathways["Sum log2fc"] = sum_fc
+    top_pathways["Sum log2fc"] = top_pathways["Term"].map(sum_fc).fillna(0.0)
 
     return top_pathways
 
-def get_overlapping_genes(df, selected_pathway_row):
+def explode_pathway_genes(top_pathways):
     """
-    Get overlapped genes as a way to identify most important genes in a given specific pathway
+    Returns a long-form table with one (Term, Gene Name) row per gene of each pathway,
+    following the order of top_pathways.
     """
-    # Normalize input genes
-    df["Gene Name"] = df["Gene Name"].astype(str).str.strip().str.upper()
+    pathway_genes = top_pathways[["Term"]].assign(**{"Gene Name": top_pathways["Genes"].str.split(";")})
+    pathway_genes = pathway_genes.explode("Gene Name", ignore_index=True)
+    pathway_genes["Gene Name"] = pathway_genes["Gene Name"].str.strip().str.upper()
+    return pathway_genes.drop_duplicates(ignore_index=True)
 
+def pathways_per_gene(top_pathways):
+    """
+    Returns a Series mapping each gene name to the "; "-separated pathways it belongs to.
+    """
+    pathway_genes = explode_pathway_genes(top_pathways)
+    return pathway_genes.groupby("Gene Name", sort=False)["Term"].agg("; ".join)
+
+def get_overlapping_genes(df, selected_pathway_row):
+    """
+    Get overlapped genes as a way to identify most important genes in a given specific pathway.
+    Returns their Gene, normalized Gene Name and log_2 fold change, by decreasing absolute fold change.
+    """
     # Get genes from selected pathway
     pathway_genes = [g.strip().upper() for g in selected_pathway_row["Genes"].split(";")]
 
-    # Get overlapping genes from input
-    overlap_df = df[df["Gene Name"].isin(pathway_genes)].copy()
-    overlap_df["abs_fc"] = overlap_df["log_2 fold change"].abs()
-    overlap_df = overlap_df.sort_values("abs_fc", ascending=False)
+    # Get overlapping genes from input, matched on the categorical codes of the gene keys
+    keys = gene_keys(df)
+    overlap = keys.isin(pathway_genes).to_numpy()
+    overlap_df = pd.DataFrame({
+        "Gene": df["Gene"].to_numpy()[overlap],
+        "Gene Name": keys.to_numpy()[overlap].astype(str),
+        "log_2 fold change": df["log_2 fold change"].to_numpy()[overlap],
+    })
+    return overlap_df.sort_values("log_2 fold change", ascending=False, key=lambda fc: fc.abs())
 
-    return overlap_df
 
 
+DGIDB_INTERACTIONS_QUERY = """
+query interactions($names: [String!]!) {
+  genes(names: $names) {
+    nodes {
+      name
+      interactions {
+        drug {
+          name
+          conceptId
+        }
+        interactionScore
+        interactionTypes {
+          type
+          directionality
+        }
+        interactionAttributes {
+          name
+          value
+        }
+        publications {
+          pmid
+        }
+        sources {
+          sourceDbName
+        }
+      }
+    }
+  }
+}
+"""
 
-def get_drug_targets_dgidb_graphql(gene_names):
+def parse_dgidb_interactions(gene_name, interactions):
+    """
+    Flattens the DGIdb interactions of a gene into table rows, keeping only the first
+    interaction type, source and PMID of each interaction.
+    """
+    rows = []
+    for interaction in interactions:
+        drug_name = interaction['drug'].get('name', 'Unknown')
+        score = interaction.get('interactionScore', 'N/A')
+        types = interaction.get('interactionTypes', [])
+        interaction_type = types[0].get('type', 'N/A') if types else 'N/A'
+        directionality = types[0].get('directionality', 'N/A') if types else 'N/A'
+        sources = interaction.get('sources', [])
+        source = sources[0]['sourceDbName'] if sources else 'N/A'
+        pmids = interaction.get('publications', [])
+        pmid = pmids[0]['pmid'] if pmids else 'N/A'
+
+        rows.append({
+            'Gene': gene_name,
+            'Drug': drug_name,
+            'Interaction Type': interaction_type,
+            'Directionality': directionality,
+            'Source': source,
+            'PMID': pmid,
+            'Interaction Score': score
+        })
+    return rows
+
+def _query_dgidb_chunk(chunk):
+    """
+    Queries DGIdb for one chunk of gene names.
+    Returns a dict mapping each gene name to its interaction rows, or None if the request failed.
+    """
+    try:
+        response = request(
+            "dgidb", "POST", GRAPHQL_URL,
+            json={"query": DGIDB_INTERACTIONS_QUERY, "variables": {"names": chunk}}
+        )
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        nodes = data['data']['genes']['nodes']
+    except:
+        return None
+
+    # DGIdb returns normalized (upper case) symbols, map them back to the input names
+    names_by_key = {}
+    for gene_name in chunk:
+        names_by_key.setdefault(str(gene_name).strip().upper(), []).append(gene_name)
+
+    # Genes without a node have no known interactions
+    chunk_results = {gene_name: [] for gene_name in chunk}
+    for node in nodes:
+        for gene_name in names_by_key.get(str(node.get('name', '')).upper(), []):
+            chunk_results[gene_name] = parse_dgidb_interactions(gene_name, node.get('interactions') or [])
+    return chunk_results
+
+def get_drug_targets_dgidb_graphql(gene_names, failed=None):
 
     """
     Queries the DGIdb GraphQL API for drug–gene interaction data for a list of gene names.
@@ -204,70 +569,39 @@ def get_drug_targets_dgidb_graphql(gene_names):
     For each gene, the function retrieves associated drugs, interaction types, 
     directionality, interaction scores, sources, and PMIDs (if available), 
     and compiles the results into a pandas DataFrame.
+    Genes are sent in chunks of DGIDB_BATCH_SIZE names per GraphQL request.
+    If a list is given as failed, the genes whose request failed are appended to it.
     """
 
+    unique_genes = list(dict.fromkeys(gene_names))
+    results_by_gene = cache_get_many("dgidb", unique_genes)
+    missing_genes = [gene_name for gene_name in unique_genes if gene_name not in results_by_gene]
+
+    for chunk_results in fan_out("dgidb", _query_dgidb_chunk, _chunks(missing_genes, DGIDB_BATCH_SIZE)):
+        if chunk_results is not None:
+            cache_set_many("dgidb", chunk_results)
+            results_by_gene.update(chunk_results)
+
+    if failed is not None:
+        failed.extend(gene_name for gene_name in missing_genes if gene_name not in results_by_gene)
+
     all_results = []
     for gene_name in gene_names:
-        graphql_query = f"""
-        {{
-          genes(names: ["{gene_name}"]) {{
-            nodes {{
-              interactions {{
-                drug {{
-                  name
-                  conceptId
-                }}
-                interactionScore
-                interactionTypes {{
-                  type
-                  directionality
-                }}
-                interactionAttributes {{
-                  name
-                  value
-                }}
-                publications {{
-                  pmid
-                }}
-                sources {{
-                  sourceDbName
-                }}
-              }}
-            }}
-          }}
-        }}
-        """
-        response = requests.post(GRAPHQL_URL, json={"query": graphql_query})
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                if 'data' in data and 'genes' in data['data'] and len(data['data']['genes']['nodes']) > 0:
-                    interactions = data['data']['genes']['nodes'][0].get('interactions', [])
-                    for interaction in interactions:
-                        drug_name = interaction['drug'].get('name', 'Unknown')
-                        score = interaction.get('interactionScore', 'N/A')
-                        types = interaction.get('interactionTypes', [])
-                        interaction_type = types[0].get('type', 'N/A') if types else 'N/A'
-                        directionality = types[0].get('directionality', 'N/A') if types else 'N/A'
-                        sources = interaction.get('sources', [])
-                        source = sources[0]['sourceDbName'] if sources else 'N/A'
-                        pmids = interaction.get('publications', [])
-                        pmid = pmids[0]['pmid'] if pmids else 'N/A'
-
-                        all_results.append({
-                            'Gene': gene_name,
-                            'Drug': drug_name,
-                            'Interaction Type': interaction_type,
-                            'Directionality': directionality,
-                            'Source': source,
-                            'PMID': pmid,
-                            'Interaction Score': score
-                        })
-            except:
-                continue
-    
+        all_results.extend(results_by_gene.get(gene_name, []))
+
     return pd.DataFrame(all_results)
 
+def filter_drug_interactions(drug_df, gene_names):
+    """
+    Returns the rows of a gene-drug interaction table that belong to the given genes,
+    ordered as gene_names, as get_drug_targets_dgidb_graphql would return them.
+    """
+    if drug_df.empty:
+        return drug_df.copy()
+    order = {gene_name: i for i, gene_name in enumerate(dict.fromkeys(gene_names))}
+    subset = drug_df[drug_df["Gene"].isin(order.keys())]
+    return subset.iloc[subset["Gene"].map(order).argsort(kind="stable")].reset_index(drop=True)
+
 def drug_with_links(df):
     """
     Returns the df with links to the resources
@@ -306,16 +640,50 @@ def estimate_table_height(df, max_visible_rows=10, base_row_height=50, tall_row_
     # Clamp height between min and max 
     return max(min(estimated_height, max_height), min_height)
 
-def normalize_disease_name(name: str) -> str:
+
+FULL_RESULTS_COLUMNS = ["Ensembl ID", "Gene", "log_2 fold change", "Biotype", "Tractability",
+                        "Drug", "Interaction Type", "PMID", "Interaction Score", "Pathways"]
+
+def _join_unique(values):
+    return "; ".join(sorted({str(v) for v in values if pd.notna(v) and v != "N/A"}))
+
+def build_full_results_table(df_selected, openTargets_df=None, drug_interactions=None, top_pathways=None):
     """
-    Normalizes the disease name to match those in Expression Atlas
+    Returns the full results table, one row per row of df_selected, with FULL_RESULTS_COLUMNS.
+    Open Targets results are joined on the Ensembl ID; drug interactions (queried by gene key,
+    see get_drug_targets_dgidb_graphql) and pathways on the gene key. Missing inputs leave their
+    columns empty.
     """
-    # If there's a comma, move the part after the comma to the front
-    if "," in name:
-        parts = [part.strip() for part in name.split(",")]
-        # e.g., ["Muscular Dystrophy", "Duchenne"] → "Duchenne Muscular Dystrophy"
-        return f"{parts[1]} {parts[0]}"
-    return name
+    full = pd.DataFrame({
+        "Ensembl ID": df_selected["Gene"].to_numpy(),
+        "Gene": gene_keys(df_selected).to_numpy(),
+        "log_2 fold change": df_selected["log_2 fold change"].to_numpy(),
+    })
+
+    if openTargets_df is not None and not openTargets_df.empty:
+        ot = openTargets_df.drop_duplicates("Ensembl ID").set_index("Ensembl ID")
+        full["Biotype"] = full["Ensembl ID"].map(ot["Biotype"])
+        full["Tractability"] = full["Ensembl ID"].map(
+            ot["Tractability"].map(lambda tags: "; ".join(tags) if isinstance(tags, list) else tags)
+        )
+
+    if drug_interactions is not None and not drug_interactions.empty:
+        drugs = drug_interactions.assign(
+            **{"Interaction Score": pd.to_numeric(drug_interactions["Interaction Score"], errors="coerce")}
+        )
+        drug_summary = drugs.groupby("Gene", sort=False).agg({
+            "Drug": _join_unique,
+            "Interaction Type": _join_unique,
+            "PMID": _join_unique,
+            "Interaction Score": "mean",
+        })
+        for column in drug_summary.columns:
+            full[column] = full["Gene"].map(drug_summary[column])
+
+    if top_pathways is not None and not top_pathways.empty:
+        full["Pathways"] = full["Gene"].map(pathways_per_gene(top_pathways)).fillna("")
+
+    return full.reindex(columns=FULL_RESULTS_COLUMNS)
 
 
 def add_links_to_final_table(df):
@@ -367,46 +735,48 @@ def add_links_to_final_table(df):
     
     return df
 
-def save_pathway_csvs(df_selected, top_pathways):
+def iter_pathway_tables(df_selected, top_pathways):
     """
-    Creates csv files for each of the top N pathways, with info about genes
+    Yields a (filename, table) pair for each of the top N pathways, with info about its genes.
+    Tables are built one at a time, so callers can write them out without holding them all.
     """
-    csv_files = {}
-
     for _, row in top_pathways.iterrows():
-        pathway_name = row["Term"]
         pathway_genes = get_overlapping_genes(df_selected, row)
-
         if not pathway_genes.empty:
-            safe_name = pathway_name.replace("/", "_").replace(" ", "_")
-
-            buf = io.StringIO()
-            pathway_genes.to_csv(buf, index=False)
-            csv_files[f"{safe_name}_genes.csv"] = buf.getvalue().encode("utf-8")
+            safe_name = row["Term"].replace("/", "_").replace(" ", "_")
+            yield f"{safe_name}_genes.csv", pathway_genes
 
-    return csv_files
-
-def save_drug_csvs(df_selected, top_pathways):
+def iter_drug_tables(df_selected, top_pathways, drug_interactions=None):
     """
-    Creates csv files for each of the top N pathways with info about genes-drugs
+    Yields a (filename, table) pair for each of the top N pathways with info about genes-drugs.
+    Each pathway table is filtered from drug_interactions, a gene-drug interaction table
+    covering the genes of df_selected; if not given, DGIdb is queried once for all pathways.
     """
-    csv_files = {}
+    overlaps = [(row["Term"], get_overlapping_genes(df_selected, row)) for _, row in top_pathways.iterrows()]
+    if drug_interactions is None:
+        all_genes = [gene for _, pathway_genes in overlaps for gene in pathway_genes["Gene Name"]]
+        drug_interactions = get_drug_targets_dgidb_graphql(list(dict.fromkeys(all_genes)))
 
-    for _, row in top_pathways.iterrows():
-        pathway_name = row["Term"]
-        pathway_genes = get_overlapping_genes(df_selected, row)
-
-        drug_df = get_drug_targets_dgidb_graphql(pathway_genes["Gene Name"].tolist())
+    for pathway_name, pathway_genes in overlaps:
+        drug_df = filter_drug_interactions(drug_interactions, pathway_genes["Gene Name"].tolist())
         if not drug_df.empty:
-            drug_df = drug_with_links(drug_df)
             safe_name = pathway_name.replace("/", "_").replace(" ", "_")
+            yield f"{safe_name}_drugs.csv", drug_with_links(drug_df)
 
-            # Write to memory instead of disk
-            buf = io.StringIO()
-            drug_df.to_csv(buf, index=False)
-            csv_files[f"{safe_name}_drugs.csv"] = buf.getvalue().encode("utf-8")
+def save_pathway_csvs(df_selected, top_pathways):
+    """
+    Creates csv files for each of the top N pathways, with info about genes
+    """
+    return {fname: df.to_csv(index=False).encode("utf-8") for fname, df in iter_pathway_tables(df_selected, top_pathways)}
 
-    return csv_files
+def save_drug_csvs(df_selected, top_pathways, drug_interactions=None):
+    """
+    Creates csv files for each of the top N pathways with info about genes-drugs (see iter_drug_tables).
+    """
+    return {
+        fname: df.to_csv(index=False).encode("utf-8")
+        for fname, df in iter_drug_tables(df_selected, top_pathways, drug_interactions)
+    }
 
 
 def create_combined_zip(zip_path, folders=[], extra_files=[]):
@@ -0,0 +1,218 @@
+import email.utils
+import os
+import random
+import threading
+import time
+
+import requests
+
+from utils.http_client import get_session
+from utils.instrumentation import record_request, record_retry, record_error
+
+
+# Requests per second allowed to each upstream API. Ensembl documents 15 per second
+# (55000 per hour); Open Targets and DGIdb publish no limit, so they get polite defaults.
+UPSTREAM_RATES = {
+    "ensembl": float(os.environ.get("TRACTOME_ENSEMBL_RATE", 15)),
+    "opentargets": float(os.environ.get("TRACTOME_OPENTARGETS_RATE", 10)),
+    "dgidb": float(os.environ.get("TRACTOME_DGIDB_RATE", 5)),
+}
+DEFAULT_RATE = 5.0
+
+MAX_RETRIES = int(os.environ.get("TRACTOME_HTTP_RETRIES", 5))
+BACKOFF_BASE = 0.5  # Seconds, doubled on every retry
+BACKOFF_CAP = 30.0
+MAX_RETRY_AFTER = 60.0  # Longer Retry-After waits are not worth blocking the analysis for
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# The circuit opens after this many consecutive failures and lets one request through after the cooldown
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Fraction of the configured rate the bucket can slow down to after repeated 429s
+MIN_RATE_FRACTION = 0.1
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class UpstreamError(Exception):
+    """
+    Raised when an upstream API keeps failing after every retry, or while its circuit is open.
+    """
+    def __init__(self, message, upstream, status_code=None):
+        super().__init__(message)
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. The rate is halved on every 429 and recovers
+    gradually with each successful request, up to the configured rate.
+    """
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, delay):
+        """
+        Slows the bucket down after a 429 and holds every request for delay seconds.
+        """
+        with self.lock:
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    def recover(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after BREAKER_THRESHOLD consecutive failures (5xx or connection errors), so a down
+    upstream does not hold every worker thread through a full retry cycle. A 429 means the upstream
+    is up but busy: it only slows down the TokenBucket.
+    """
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half open: let this request through and hold the others for another cooldown
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+def _get_limiter(upstream):
+    """
+    Returns the (TokenBucket, CircuitBreaker) of an upstream API, shared by every thread of the process.
+    """
+    limiter = _limiters.get(upstream)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(upstream)
+            if limiter is None:
+                limiter = (TokenBucket(UPSTREAM_RATES.get(upstream, DEFAULT_RATE)), CircuitBreaker())
+                _limiters[upstream] = limiter
+    return limiter
+
+
+def _retry_after(response):
+    """
+    Seconds to wait given by a Retry-After header (delay or HTTP date), or None.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    """
+    Exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(upstream, method, url, **kwargs):
+    """
+    Sends a request to an upstream API ("ensembl", "opentargets", "dgidb") through its shared
+    session, rate limited by its token bucket. 429, 5xx and connection errors are retried with
+    jittered exponential backoff, or after the Retry-After delay when the API gives one.
+    Returns the response for any other status code; raises UpstreamError once retries run out.
+    The circuit breaker is checked before the first attempt only, so it never cuts short the
+    retries of a request already in its backoff loop.
+    """
+    bucket, breaker = _get_limiter(upstream)
+    status_code = None
+
+    if not breaker.allow():
+        record_error(upstream)
+        raise UpstreamError(f"{upstream} is not responding, please try again later.", upstream)
+
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+
+        start = time.perf_counter()
+        try:
+            response = get_session(upstream).request(method, url, **kwargs)
+        except requests.RequestException:
+            record_request(upstream, time.perf_counter() - start)
+            breaker.record_failure()
+            delay = _backoff(attempt)
+        else:
+            record_request(upstream, time.perf_counter() - start, len(response.content), response.status_code)
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                bucket.recover()
+                return response
+
+            status_code = response.status_code
+            delay = _retry_after(response)
+            if delay is not None and delay > MAX_RETRY_AFTER:
+                break
+            if delay is None:
+                delay = _backoff(attempt)
+            if status_code == 429:
+                # Rate limited, not down: slow down without counting towards the breaker
+                bucket.throttle(delay)
+            else:
+                breaker.record_failure()
+
+        if attempt < MAX_RETRIES:
+            record_retry(upstream)
+            time.sleep(delay)
+
+    record_error(upstream)
+    if status_code == 429:
+        message = f"Error 429: {upstream} rate limit exceeded. Please try again later."
+    else:
+        message = f"{upstream} request failed after {MAX_RETRIES + 1} attempts ({status_code or 'connection error'})."
+    raise UpstreamError(message, upstream, status_code)
@@ -0,0 +1,131 @@
+import hashlib
+import io
+import itertools
+
+import pandas as pd
+import streamlit as st
+
+from utils.instrumentation import track_run, track_stage
+from utils.export import write_zip
+from utils.jobs import submit_job, load_artifact
+from utils.pipeline import (get_disease_name, read_expression_tsv, fetch_gene_names, find_possible_targets_of_drugs,
+                            analyze_pathways, get_drug_targets_dgidb_graphql,
+                            iter_pathway_tables, iter_drug_tables, gene_keys)
+
+
+# Cached results kept per stage, shared by all sessions of the server
+STAGE_CACHE_ENTRIES = 64
+
+# Stages of an analysis job, in the order they finish and the Home page shows them
+ANALYSIS_STAGES = ["genes", "open_targets", "pathways", "drugs"]
+
+# File artifact of an export job
+EXPORT_ARTIFACT = "all_tables.zip"
+
+# The Home page pipeline runs as a background job (see utils.jobs), keyed by a digest of
+# the uploaded TSV, so a refresh or a second tab reattaches to it. Each stage result is
+# stored as an artifact as soon as it finishes; the page reads them through load_job_artifact.
+
+
+def file_digest(data):
+    """
+    Returns the SHA-256 hex digest of the uploaded file contents.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=STAGE_CACHE_ENTRIES, ttl=3600)
+def load_disease_name(mesh_id):
+    """
+    Cached get_disease_name. Expires after an hour so failed lookups are retried.
+    """
+    return get_disease_name(mesh_id)
+
+
+def run_analysis(report, tsv_bytes):
+    """
+    Job function of an analysis: gene names, Open Targets, every enriched pathway and the
+    DGIdb interactions of all genes. The page takes the top N pathways from the full list,
+    so changing N does not start a new job. The timing table of the stages run so far is
+    reported as "metrics" after each of them.
+    """
+    with track_run("analysis") as run:
+        # Genes whose requests failed after every retry are kept in attrs["failed"], so the page can warn about them
+        with track_stage("genes"):
+            failed = []
+            df_selected = fetch_gene_names(read_expression_tsv(io.BytesIO(tsv_bytes)), failed)
+            df_selected.attrs["failed"] = failed
+        report("genes", df_selected)
+        report("metrics", run.table())
+
+        with track_stage("open_targets"):
+            failed = []
+            openTargets_results = find_possible_targets_of_drugs(df_selected["Gene"].tolist(), failed)
+            openTargets_df = pd.DataFrame([r for r in openTargets_results if r is not None])
+            openTargets_df.attrs["failed"] = failed
+        report("open_targets", openTargets_df)
+        report("metrics", run.table())
+
+        with track_stage("pathways"):
+            pathways = analyze_pathways(df_selected, None)
+        report("pathways", pathways if isinstance(pathways, pd.DataFrame) else pd.DataFrame())
+        report("metrics", run.table())
+
+        with track_stage("drugs"):
+            gene_names = gene_keys(df_selected).unique().tolist()
+            failed = []
+            all_drug_df = get_drug_targets_dgidb_graphql(gene_names, failed)
+            all_drug_df.attrs["failed"] = failed
+        report("metrics", run.table())
+        report("drugs", all_drug_df)
+
+
+def submit_analysis(digest, tsv_bytes, retry=False):
+    """
+    Starts the analysis of an uploaded TSV, or reattaches to the latest one for it.
+    A failed analysis is only started again with retry. Returns the job id.
+    """
+    return submit_job(f"analysis:{digest}", ANALYSIS_STAGES, run_analysis, tsv_bytes, retry=retry)
+
+
+def run_export(report, df_selected, top_pathways, drug_interactions, extra_files=()):
+    """
+    Job function of the "Generate and Download Tables" button: a ZIP archive of the per-pathway
+    gene and drug CSVs, written straight to the job folder (see utils.jobs.artifact_path).
+    """
+    def write(path):
+        tables = itertools.chain(
+            iter_pathway_tables(df_selected, top_pathways),
+            iter_drug_tables(df_selected, top_pathways, drug_interactions),
+        )
+        write_zip(path, tables, extra_files)
+
+    with track_run("export"), track_stage("export"):
+        report(EXPORT_ARTIFACT, write)
+
+
+def export_key(analysis_job_id, number_pathways):
+    """
+    Job key of the export of an analysis for a number of top pathways.
+    """
+    return f"export:{analysis_job_id}:{number_pathways}:zip"
+
+
+def submit_export(analysis_job_id, number_pathways, df_selected, top_pathways, drug_interactions, extra_files=(),
+                  retry=False):
+    """
+    Starts packaging the per-pathway CSVs of an analysis, or reattaches to it. A failed export is
+    only started again with retry. Returns the job id.
+    """
+    return submit_job(
+        export_key(analysis_job_id, number_pathways), [EXPORT_ARTIFACT], run_export,
+        df_selected, top_pathways, drug_interactions, extra_files, retry=retry
+    )
+
+
+@st.cache_data(show_spinner=False, max_entries=STAGE_CACHE_ENTRIES)
+def load_job_artifact(job_id, name):
+    """
+    Cached result of a finished job stage. Only call it for completed stages, since artifacts never change.
+    """
+    return load_artifact(job_id, name)
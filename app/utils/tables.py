@@ -0,0 +1,125 @@
+import math
+import re
+
+import pandas as pd
+import streamlit as st
+
+
+PAGE_SIZES = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+ALL_COLUMNS = "All columns"
+
+HTML_TAG = re.compile(r"<[^>]+>")
+
+# Same look as the DataTables tables the pages used before; no external CSS or JS is loaded
+TABLE_CSS = """
+<style>
+.tractome-table-wrapper {
+    overflow-x: auto;
+    margin-bottom: 0.5rem;
+    font-size: 15px;
+}
+.tractome-table {
+    width: 100%;
+    border-collapse: collapse;
+    font-family: "Segoe UI", "Helvetica", "Arial", sans-serif;
+    color: #31333f;
+    font-size: inherit;
+}
+.tractome-table th, .tractome-table td {
+    background-color: white;
+    border-bottom: 1px solid #ccc;
+    padding: 6px 10px;
+    text-align: left;
+    vertical-align: top;
+}
+.tractome-table thead th {
+    font-weight: 600;
+    border-bottom: 2px solid #aaa;
+}
+.tractome-table tbody tr:hover td {
+    background-color: #f0f0f0;
+}
+</style>
+"""
+
+
+def _plain_text(column):
+    """
+    Text of a column as shown to the user, without the HTML of links and tags.
+    """
+    return column.astype(str).str.replace(HTML_TAG, "", regex=True)
+
+
+def filter_table(df, query, column=ALL_COLUMNS):
+    """
+    Rows of df whose visible text contains query (case insensitive), in one column or in any of them.
+    """
+    if not query:
+        return df
+    columns = df.columns if column == ALL_COLUMNS else [column]
+    mask = pd.Series(False, index=df.index)
+    for col in columns:
+        mask |= _plain_text(df[col]).str.contains(query, case=False, regex=False)
+    return df[mask]
+
+
+def sort_table(df, column, ascending=True):
+    """
+    Sorts df by a column, numerically for numeric columns and by visible text otherwise.
+    """
+    if column is None or column not in df.columns:
+        return df
+    if pd.api.types.is_numeric_dtype(df[column]):
+        return df.sort_values(column, ascending=ascending, kind="stable")
+    return df.sort_values(column, ascending=ascending, kind="stable", key=lambda col: _plain_text(col).str.lower())
+
+
+def render_table(df, key, page_size=DEFAULT_PAGE_SIZE, font_size=None):
+    """
+    Shows a DataFrame as a searchable, sortable and paginated HTML table.
+    Filtering, sorting and paging run on the server; only the rows of the current page
+    are converted to HTML and sent to the browser. Cells may contain HTML (links, tags).
+    key must be unique on the page, it prefixes the keys of the table widgets.
+    page_size is the initial number of rows per page, one of PAGE_SIZES.
+    """
+    if df is None or df.empty:
+        st.info("No rows to show.")
+        return
+
+    search_col, column_col, sort_col, order_col = st.columns([3, 2, 2, 1])
+    query = search_col.text_input("Search", key=f"{key}_search", placeholder="Search...")
+    search_column = column_col.selectbox("In", [ALL_COLUMNS] + list(df.columns), key=f"{key}_search_column")
+    sort_column = sort_col.selectbox("Sort by", [None] + list(df.columns), key=f"{key}_sort",
+                                     format_func=lambda c: "—" if c is None else c)
+    descending = order_col.toggle("Desc.", key=f"{key}_desc")
+
+    view = sort_table(filter_table(df, query, search_column), sort_column, ascending=not descending)
+
+    size_key, page_key = f"{key}_page_size", f"{key}_page"
+    size = st.session_state.get(size_key, page_size)
+    n_pages = max(1, math.ceil(len(view) / size))
+    # Go back to the first page when the search or the order changes, as DataTables did
+    view_state = (query, search_column, sort_column, descending, size)
+    if st.session_state.get(f"{key}_view") != view_state:
+        st.session_state[f"{key}_view"] = view_state
+        st.session_state[page_key] = 1
+    elif st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    page = st.session_state.get(page_key, 1)
+
+    start = (page - 1) * size
+    html_table = view.iloc[start:start + size].to_html(escape=False, index=False, classes="tractome-table", border=0)
+    style = f' style="font-size:{font_size}px"' if font_size else ""
+    st.markdown(f'{TABLE_CSS}<div class="tractome-table-wrapper"{style}>{html_table}</div>', unsafe_allow_html=True)
+
+    info_col, size_col, page_col = st.columns([4, 1, 1])
+    if view.empty:
+        info_col.caption(f"No matching rows (filtered from {len(df)} rows)")
+    else:
+        filtered = f" (filtered from {len(df)} rows)" if len(view) != len(df) else ""
+        info_col.caption(f"Showing {start + 1} to {min(start + size, len(view))} of {len(view)} rows{filtered}")
+    size_col.selectbox("Rows", PAGE_SIZES, index=PAGE_SIZES.index(page_size),
+                       key=size_key, label_visibility="collapsed")
+    page_col.number_input("Page", min_value=1, max_value=n_pages, step=1, key=page_key,
+                          label_visibility="collapsed")
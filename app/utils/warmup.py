@@ -0,0 +1,64 @@
+import logging
+import os
+import threading
+import time
+
+from utils.enrichment import load_reactome_library
+from utils.ensembl_index import ENSEMBL_INDEX_PATH
+from utils.mesh_index import MESH_INDEX_PATH
+
+
+WARMUP_DISABLED = os.environ.get("TRACTOME_WARMUP_DISABLED", "") not in ("", "0")
+READ_AHEAD_BLOCK_SIZE = 1024 * 1024
+
+logger = logging.getLogger("tractome.warmup")
+_started = False
+_started_lock = threading.Lock()
+
+
+def _read_ahead(path):
+    """
+    Reads a file once, so its pages are in the operating system cache before the first lookup.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        while f.read(READ_AHEAD_BLOCK_SIZE):
+            pass
+
+
+def warm_up():
+    """
+    Imports the dependencies the analysis and the result charts are deferred to, loads the
+    local Reactome library and reads the local indexes ahead. Returns the seconds it took.
+    """
+    start = time.perf_counter()
+    import plotly.express  # noqa: F401
+    from scipy.stats import hypergeom  # noqa: F401
+
+    load_reactome_library()
+    for path in (ENSEMBL_INDEX_PATH, MESH_INDEX_PATH):
+        _read_ahead(path)
+    return time.perf_counter() - start
+
+
+def _run():
+    try:
+        logger.info(f"Warm-up done in {warm_up():.2f}s")
+    except Exception as e:
+        logger.warning(f"Warm-up failed: {e}")
+
+
+def start_warm_up():
+    """
+    Runs warm_up once per process in a daemon thread, so the first page does not wait for it.
+    Does nothing if warm-up is disabled or has already started.
+    """
+    global _started
+    if WARMUP_DISABLED or _started:
+        return
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, name="tractome-warmup", daemon=True).start()
@@ -0,0 +1,269 @@
+"""
+Local stand-ins for the Ensembl REST, Open Targets and DGIdb GraphQL APIs, for benchmarks
+without network access. Answers are seeded from assets/demoData; synthetic gene ids
+(see synthetic.py) get deterministic names, tractability and drug interactions.
+
+    python benchmarks/mock_upstreams.py --port 8765 --latency 0.05 --throttle 0.02
+
+serves http://127.0.0.1:8765/ensembl, /opentargets and /dgidb, to be used with
+TRACTOME_ENSEMBL_URL, TRACTOME_OPENTARGETS_URL and TRACTOME_DGIDB_URL.
+"""
+import argparse
+import glob
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+
+
+DEMO_DIR = Path(__file__).resolve().parents[1] / "assets" / "demoData"
+
+HTML_TAG = re.compile(r"<[^>]+>")
+SYNTHETIC_ID = re.compile(r"^ENSG9(\d{10})$")
+
+
+def _strip_html(value):
+    return HTML_TAG.sub("", str(value)).strip()
+
+
+def _stable_hash(value):
+    return zlib.crc32(str(value).encode())
+
+
+def synthetic_gene_name(ensembl_id):
+    """
+    Gene name served for a synthetic id (ENSG9 followed by 10 digits), or None for other ids.
+    """
+    match = SYNTHETIC_ID.match(ensembl_id)
+    return f"SYN{int(match.group(1))}" if match else None
+
+
+class DemoPayloads:
+    """
+    Gene names, Open Targets records and DGIdb interactions read from assets/demoData.
+    """
+    def __init__(self, demo_dir=DEMO_DIR):
+        genes = pd.read_csv(demo_dir / "genes.csv")
+        self.names = {_strip_html(g): str(n) for g, n in zip(genes["Gene"], genes["Gene Name"])}
+
+        open_targets = pd.read_csv(demo_dir / "openTargets_genes.csv")
+        self.targets = {}
+        for _, row in open_targets.iterrows():
+            labels = re.findall(r">([^<>]+)</span>", str(row["Tractability"]))
+            self.targets[_strip_html(row["Ensembl ID"])] = {
+                "biotype": row["Biotype"],
+                "tractability": [{"label": label, "modality": "SM", "value": True} for label in labels],
+            }
+
+        self.interactions = {}
+        for path in glob.glob(str(demo_dir / "all_drug_csvs" / "*.csv")):
+            for _, row in pd.read_csv(path).iterrows():
+                gene = _strip_html(row["Gene"]).upper()
+                interaction_type = row.get("Interaction Type")
+                self.interactions.setdefault(gene, {})[_strip_html(row["Drug"])] = {
+                    "drug": {"name": _strip_html(row["Drug"])},
+                    "interactionScore": row["Interaction Score"],
+                    "interactionTypes": [] if pd.isna(interaction_type) or interaction_type == "N/A" else [
+                        {"type": interaction_type, "directionality": row.get("Directionality")}
+                    ],
+                    "publications": [] if pd.isna(row.get("PMID")) else [{"pmid": _strip_html(row["PMID"])}],
+                    "sources": [{"sourceDbName": row["Source"]}],
+                }
+        self.interactions = {gene: list(drugs.values()) for gene, drugs in self.interactions.items()}
+
+        self.demo_ids = sorted(self.names)
+        self.target_ids = sorted(self.targets)
+        self.drug_genes = sorted(self.interactions)
+
+    def gene_name(self, ensembl_id):
+        return self.names.get(ensembl_id) or synthetic_gene_name(ensembl_id)
+
+    def target(self, ensembl_id):
+        name = self.gene_name(ensembl_id)
+        if name is None:
+            return None
+        template = self.targets.get(ensembl_id)
+        if template is None:
+            # Other genes borrow the record of a demo target
+            template = self.targets[self.target_ids[_stable_hash(ensembl_id) % len(self.target_ids)]]
+        return {
+            "id": ensembl_id,
+            "approvedSymbol": name,
+            "approvedName": f"{name} protein",
+            "biotype": template["biotype"],
+            "geneticConstraint": [{"constraintType": "lof", "exp": 10.0, "obs": 4, "score": 0.5,
+                                   "oe": 0.4, "oeLower": 0.2, "oeUpper": 0.7}],
+            "tractability": template["tractability"],
+        }
+
+    def drug_node(self, gene_name):
+        key = str(gene_name).strip().upper()
+        interactions = self.interactions.get(key)
+        if interactions is None and key.startswith("SYN") and _stable_hash(key) % 3 == 0:
+            # A third of the synthetic genes have interactions, copied from a demo gene
+            interactions = self.interactions[self.drug_genes[_stable_hash(key) % len(self.drug_genes)]]
+        if not interactions:
+            return None
+        return {"name": key, "interactions": interactions}
+
+
+class MockUpstreams:
+    """
+    ThreadingHTTPServer serving the three APIs under /ensembl, /opentargets and /dgidb.
+    Every request waits latency seconds; a throttle fraction of them answer 429 with Retry-After.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, throttle=0.0, retry_after=0.1, seed=0):
+        self.payloads = DemoPayloads()
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def urls(self):
+        """
+        Environment variables pointing the pipeline at this server.
+        """
+        return {
+            "TRACTOME_ENSEMBL_URL": f"{self.base_url}/ensembl",
+            "TRACTOME_OPENTARGETS_URL": f"{self.base_url}/opentargets",
+            "TRACTOME_DGIDB_URL": f"{self.base_url}/dgidb",
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-upstreams", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def _count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _throttled(self):
+        with self.lock:
+            return self.throttle > 0 and self.random.random() < self.throttle
+
+    def answer(self, method, path, body):
+        """
+        Returns (status, payload) for a request.
+        """
+        upstream = path.strip("/").split("/")[0]
+        self._count(f"{upstream}_requests")
+        if self.latency:
+            time.sleep(self.latency)
+        if self._throttled():
+            self._count(f"{upstream}_throttled")
+            return 429, {"error": "Too many requests"}
+
+        if upstream == "ensembl":
+            return self._ensembl(method, path, body)
+        if upstream == "opentargets":
+            return self._open_targets(body)
+        if upstream == "dgidb":
+            return self._dgidb(body)
+        return 404, {"error": f"Unknown upstream {upstream}"}
+
+    def _ensembl(self, method, path, body):
+        if path.startswith("/ensembl/info/data"):
+            return 200, {"releases": [0]}
+        if method == "POST" and path.rstrip("/") == "/ensembl/lookup/id":
+            records = {}
+            for ensembl_id in body.get("ids", []):
+                name = self.payloads.gene_name(ensembl_id)
+                records[ensembl_id] = None if name is None else {
+                    "id": ensembl_id, "display_name": name, "biotype": "protein_coding", "version": 1
+                }
+            return 200, records
+        if method == "GET" and path.startswith("/ensembl/lookup/id/"):
+            ensembl_id = path.split("?")[0].rstrip("/").split("/")[-1]
+            name = self.payloads.gene_name(ensembl_id)
+            if name is None:
+                return 400, {"error": f"ID '{ensembl_id}' not found"}
+            return 200, {"id": ensembl_id, "display_name": name, "biotype": "protein_coding", "version": 1}
+        return 404, {"error": "Not found"}
+
+    def _open_targets(self, body):
+        variables = body.get("variables") or {}
+        if "ensemblIds" in variables:
+            targets = [self.payloads.target(i) for i in variables["ensemblIds"]]
+            return 200, {"data": {"targets": [t for t in targets if t is not None]}}
+        if "ensemblId" in variables:
+            return 200, {"data": {"target": self.payloads.target(variables["ensemblId"])}}
+        if "meta" in body.get("query", ""):
+            return 200, {"data": {"meta": {"dataVersion": {"year": "0", "month": "0"}}}}
+        return 400, {"errors": [{"message": "Unsupported query"}]}
+
+    def _dgidb(self, body):
+        names = (body.get("variables") or {}).get("names", [])
+        nodes = [self.payloads.drug_node(name) for name in names]
+        return 200, {"data": {"genes": {"nodes": [n for n in nodes if n is not None]}}}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+                status, payload = mock.answer(method, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", str(mock.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply("GET")
+
+            def do_POST(self):
+                self._reply("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve mock Ensembl, Open Targets and DGIdb APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After of the 429 answers, in seconds")
+    args = parser.parse_args()
+
+    mock = MockUpstreams(port=args.port, latency=args.latency, throttle=args.throttle, retry_after=args.retry_after)
+    for name, url in mock.urls().items():
+        print(f"{name}={url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
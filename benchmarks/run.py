@@ -0,0 +1,246 @@
+"""
+Benchmarks the Tractome pipeline against local mock upstream servers, without network access.
+
+    python benchmarks/run.py
+    python benchmarks/run.py --sizes 300 5000 50000 --latency 0.05 --throttle 0.02
+    python benchmarks/run.py --compare benchmarks/results/<commit>.json
+
+Results are written as JSON to benchmarks/results/<commit>.json (see --out), one entry per
+input size with the wall time, throughput and upstream requests of every stage, and the
+cold-start import times of the app modules.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+sys.path.insert(0, str(REPO_DIR / "app"))
+
+from mock_upstreams import MockUpstreams
+from synthetic import write_expression_tsv, write_gene_sets
+
+
+DEFAULT_SIZES = [300, 2000, 10000, 50000]
+SINGLE_LOOKUPS = 50  # Ids sent one by one to find_possible_target_of_drugs
+NUMBER_PATHWAYS = 10
+# Modules imported by the app pages, timed in fresh interpreters
+COLD_START_MODULES = ["streamlit", "utils.pipeline", "utils.stages", "utils.export", "utils.demo_bundle", "utils.charts",
+                      "utils.warmup"]
+COLD_START_REPEATS = 3
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def _configure_environment(mock, work_dir, max_rows):
+    """
+    Points the pipeline at the mock servers and a synthetic gene set library.
+    Must run before the app modules are imported, as they read their configuration at import time.
+    """
+    os.environ.update(mock.urls())
+    os.environ["TRACTOME_CACHE_DISABLED"] = "1"
+    os.environ["TRACTOME_ENSEMBL_INDEX"] = str(work_dir / "no_index.sqlite")
+    for upstream in ("ENSEMBL", "OPENTARGETS", "DGIDB"):
+        os.environ[f"TRACTOME_{upstream}_RELEASE"] = "benchmark"
+    gmt_path = work_dir / "Reactome_2022.gmt"
+    write_gene_sets(gmt_path, max_rows)
+    os.environ["TRACTOME_REACTOME_GMT"] = str(gmt_path)
+
+
+def _stage(results, name, mock, rows, func):
+    """
+    Runs one stage, recording its wall time, throughput and the requests the mocks received.
+    """
+    from utils.instrumentation import track_stage
+
+    before = mock.snapshot()
+    start = time.perf_counter()
+    with track_stage(name):
+        value = func()
+    elapsed = time.perf_counter() - start
+    after = mock.snapshot()
+    results[name] = {
+        "seconds": round(elapsed, 6),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "upstream": {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)},
+    }
+    return value
+
+
+def run_size(mock, work_dir, rows):
+    """
+    Runs every benchmarked stage on a synthetic TSV of the given number of rows.
+    """
+    import pandas as pd
+    from utils.instrumentation import track_run
+    from utils.pipeline import (read_expression_tsv, fetch_gene_names, find_possible_target_of_drugs, find_possible_targets_of_drugs,
+                                analyze_pathways, get_drug_targets_dgidb_graphql, save_drug_csvs,
+                                build_full_results_table, iter_pathway_tables, iter_drug_tables, gene_keys)
+    from utils.export import write_zip
+
+    tsv_path = work_dir / f"expression_{rows}.tsv"
+    unique_ids = write_expression_tsv(tsv_path, rows)
+    stages = {}
+
+    with track_run(f"benchmark_{rows}") as run:
+        df_selected = _stage(stages, "fetch_gene_names", mock, rows,
+                             lambda: fetch_gene_names(read_expression_tsv(tsv_path)))
+        genes = len(df_selected)
+        ensembl_ids = df_selected["Gene"].tolist()
+        gene_names = gene_keys(df_selected).unique().tolist()
+
+        _stage(stages, "find_possible_target_of_drugs", mock, min(SINGLE_LOOKUPS, genes),
+               lambda: [find_possible_target_of_drugs(i) for i in ensembl_ids[:SINGLE_LOOKUPS]])
+        open_targets = _stage(stages, "find_possible_targets_of_drugs", mock, genes,
+                              lambda: find_possible_targets_of_drugs(ensembl_ids))
+        open_targets_df = pd.DataFrame([r for r in open_targets if r is not None])
+        top_pathways = _stage(stages, "analyze_pathways", mock, genes,
+                              lambda: analyze_pathways(df_selected, NUMBER_PATHWAYS))
+        all_drug_df = _stage(stages, "get_drug_targets_dgidb_graphql", mock, genes,
+                             lambda: get_drug_targets_dgidb_graphql(gene_names))
+        _stage(stages, "save_drug_csvs", mock, genes,
+               lambda: save_drug_csvs(df_selected, top_pathways, all_drug_df))
+        _stage(stages, "export_zip", mock, genes,
+               lambda: write_zip(work_dir / f"all_tables_{rows}.zip", itertools.chain(
+                   iter_pathway_tables(df_selected, top_pathways),
+                   iter_drug_tables(df_selected, top_pathways, all_drug_df))))
+        _stage(stages, "summary_table", mock, genes,
+               lambda: build_full_results_table(df_selected, open_targets_df, all_drug_df, top_pathways))
+
+    # Retries and errors seen by the client, from the instrumentation of utils.ratelimit
+    for row in run.table().to_dict(orient="records"):
+        if row["Stage"] in stages:
+            stages[row["Stage"]]["requests"] = int(row["Requests"])
+            stages[row["Stage"]]["retries"] = int(row["Retries"])
+            stages[row["Stage"]]["errors"] = int(row["Errors"])
+
+    return {
+        "rows": rows,
+        "unique_ids": unique_ids,
+        "genes": genes,
+        "drug_interactions": len(all_drug_df),
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 6),
+        "stages": stages,
+    }
+
+
+def _time_in_new_interpreter(code):
+    """
+    Runs code in a fresh Python process with the app on its path; returns the seconds it reports.
+    """
+    script = (f"import sys, time; sys.path.insert(0, {str(REPO_DIR / 'app')!r}); "
+              f"start = time.perf_counter(); {code}; print(time.perf_counter() - start)")
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_cold_start(repeats=COLD_START_REPEATS):
+    """
+    Best of repeats import times of COLD_START_MODULES, each in a new interpreter as in a new server
+    process, and the duration of utils.warmup.warm_up after them.
+    """
+    imports = {
+        module: round(min(_time_in_new_interpreter(f"import {module}") for _ in range(repeats)), 6)
+        for module in COLD_START_MODULES
+    }
+    warm_up = min(
+        _time_in_new_interpreter("from utils.warmup import warm_up; start = time.perf_counter(); warm_up()")
+        for _ in range(repeats)
+    )
+    return {"imports": imports, "warm_up": round(warm_up, 6)}
+
+
+def compare(current, baseline_path):
+    """
+    Prints the time ratio of every stage against a previous results file (>1 is slower).
+    """
+    with open(baseline_path) as f:
+        baseline_report = json.load(f)
+    baseline = {entry["rows"]: entry for entry in baseline_report["results"]}
+    print(f"\nCompared with {baseline_path} (ratio > 1 is slower):")
+    old_imports = baseline_report.get("cold_start", {}).get("imports", {})
+    for module, seconds in current.get("cold_start", {}).get("imports", {}).items():
+        if old_imports.get(module):
+            ratio = seconds / old_imports[module]
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"  import {module:<38} {ratio:6.2f}x{flag}")
+    for entry in current["results"]:
+        old = baseline.get(entry["rows"])
+        if old is None:
+            continue
+        for name, stage in entry["stages"].items():
+            if name in old["stages"] and old["stages"][name]["seconds"] > 0:
+                ratio = stage["seconds"] / old["stages"][name]["seconds"]
+                flag = "  <-- slower" if ratio > 1.2 else ""
+                print(f"  {entry['rows']:>6} rows  {name:<32} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Tractome pipeline against local mock APIs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Rows of the synthetic TSVs")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every mock request")
+    parser.add_argument("--throttle", type=float, default=0.0, help="Fraction of mock requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After of the 429 answers, in seconds")
+    parser.add_argument("--out", help="Results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare with")
+    args = parser.parse_args(argv)
+
+    mock = MockUpstreams(latency=args.latency, throttle=args.throttle, retry_after=args.retry_after).start()
+    commit, dirty = _git_commit()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            work_dir = Path(tmp)
+            _configure_environment(mock, work_dir, max(args.sizes))
+            cold_start = measure_cold_start()
+            print("cold start: " + " ".join(f"{module}={seconds:.2f}s" for module, seconds in cold_start["imports"].items())
+                  + f" warm_up={cold_start['warm_up']:.2f}s")
+            results = []
+            for rows in args.sizes:
+                entry = run_size(mock, work_dir, rows)
+                print(f"{rows:>6} rows: {entry['total_seconds']:.2f}s "
+                      + " ".join(f"{name}={stage['seconds']:.2f}s" for name, stage in entry["stages"].items()))
+                results.append(entry)
+    finally:
+        mock.stop()
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_iso": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"latency": args.latency, "throttle": args.throttle, "retry_after": args.retry_after},
+        "cold_start": cold_start,
+        "results": results,
+    }
+    out = Path(args.out) if args.out else BENCHMARKS_DIR / "results" / f"{commit}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Synthetic benchmark inputs: Expression Atlas-like differential expression TSVs of any size,
+and a Reactome-like GMT library covering their genes.
+"""
+import random
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from mock_upstreams import DEMO_DIR, synthetic_gene_name
+
+
+TSV_COLUMNS = ["Gene", "Species", "Experiment accession", "Comparison", "log_2 fold change",
+               "Adjusted p-value", "t-statistic"]
+
+DUPLICATE_FRACTION = 0.15  # Rows repeating a gene in another comparison, as Expression Atlas exports do
+UNKNOWN_FRACTION = 0.02  # Ids the mock Ensembl API does not know
+
+
+def synthetic_ensembl_id(n):
+    return f"ENSG9{n:010d}"
+
+
+def write_expression_tsv(path, rows, seed=0):
+    """
+    Writes a TSV with the columns of an Expression Atlas export. Gene ids are the demo genes
+    first, then synthetic ids, plus a few unknown ids; some genes appear in several comparisons.
+    Returns the number of unique gene ids.
+    """
+    rng = np.random.default_rng(seed)
+    demo = pd.read_csv(DEMO_DIR / "colorectal.tsv", sep="\t")
+
+    n_genes = max(1, int(rows * (1 - DUPLICATE_FRACTION)))
+    demo_ids = list(demo["Gene"].unique())[:n_genes]
+    n_unknown = int(n_genes * UNKNOWN_FRACTION)
+    n_synthetic = max(0, n_genes - len(demo_ids) - n_unknown)
+    gene_ids = (
+        demo_ids
+        + [synthetic_ensembl_id(i) for i in range(n_synthetic)]
+        + [f"ENSG8{i:010d}" for i in range(n_unknown)]
+    )
+    genes = np.concatenate([gene_ids, rng.choice(gene_ids, rows - len(gene_ids))]) if rows > len(gene_ids) else np.array(gene_ids[:rows])
+
+    df = pd.DataFrame({
+        "Gene": genes,
+        "Species": "homo sapiens",
+        "Experiment accession": rng.choice(demo["Experiment accession"].unique(), len(genes)),
+        "Comparison": rng.choice(demo["Comparison"].unique(), len(genes)),
+        "log_2 fold change": np.round(rng.uniform(1, 12, len(genes)), 1),
+        "Adjusted p-value": rng.uniform(1e-12, 0.05, len(genes)),
+        "t-statistic": "",
+    }, columns=TSV_COLUMNS)
+    df.to_csv(path, sep="\t", index=False)
+    return len(set(genes))
+
+
+def write_gene_sets(path, n_synthetic_genes, n_terms=1500, seed=0):
+    """
+    Writes a GMT library: the demo top pathways with their genes, and synthetic Reactome-like
+    terms sampling demo and synthetic gene names. Returns the number of terms.
+    """
+    rng = random.Random(seed)
+    top = pd.read_csv(DEMO_DIR / "topPathways.csv")
+    demo_names = sorted(pd.read_csv(DEMO_DIR / "genes.csv")["Gene Name"].astype(str).unique())
+    pool = demo_names + [synthetic_gene_name(synthetic_ensembl_id(i)) for i in range(n_synthetic_genes)]
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for term, genes in zip(top["Term"], top["Genes"]):
+            f.write("\t".join([term, ""] + genes.split(";") + rng.sample(pool, min(20, len(pool)))) + "\n")
+        for i in range(n_terms - len(top)):
+            size = min(len(pool), int(rng.lognormvariate(3.5, 0.9)) + 5)
+            f.write("\t".join([f"Synthetic Pathway {i} R-HSA-9{i:06d}", ""] + rng.sample(pool, size)) + "\n")
+    return n_terms